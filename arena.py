@@ -0,0 +1,191 @@
+"""
+PySnake arena
+Many snakes and foods on one board for the multiplayer mode. The board is the
+occupancy index shared by every snake, so a tick checks one cell per snake
+whatever the length of the snakes.
+"""
+
+from random import Random
+from typing import Optional
+
+import engine
+from engine import EMPTY, SNAKE, Board
+
+# Changes made by a tick, as (kind, id, cell) tuples:
+# HEAD: the head of the snake entered the cell
+# TAIL: the tail of the snake left its cell (the cell is 0)
+# FOOD: the food of that index moved to the cell, -1 when it is off the board
+# SPAWN: a snake appeared with its tail in the cell, its other cells follow as HEAD
+# DIE: the snake died or its player left, its cells are emptied (the cell is 0)
+HEAD = 1
+TAIL = 2
+FOOD = 3
+SPAWN = 4
+DIE = 5
+
+# Ticks a player waits for a new snake after dying
+RESPAWN_TICKS = 10
+# Random cells tried for a new snake or a food before waiting for the next tick
+SPAWN_ATTEMPTS = 32
+
+
+class Arena:
+    def __init__(
+        self, width: int, height: int, food_count: int, seed: Optional[int] = None
+    ):
+        self.width = width
+        self.height = height
+        self.board = Board(width, height)
+        self.rng = Random(seed)
+        self.ticks = 0
+        self.offsets = {d: self.board.offset(d) for d in engine.DIRECTIONS}
+        # Snakes on the board by player id, and the tick at which the players
+        # without a snake get a new one
+        self.snakes: dict[int, engine.Snake] = {}
+        self.respawns: dict[int, int] = {}
+        self.next_id = 0
+        # The food is not put on the board, which only holds what kills a snake,
+        # the cell of every food is indexed instead
+        self.foods = [engine.Food(None) for _ in range(food_count)]
+        self.food_cells: dict[int, int] = {}
+        # Changes since the last tick, including the players who joined or left
+        self.events: list[tuple[int, int, int]] = []
+        for index in range(food_count):
+            self.place_food(index)
+
+    def join(self) -> int:
+        player = self.next_id
+        self.next_id += 1
+        self.respawns[player] = self.ticks
+        return player
+
+    def leave(self, player: int):
+        self.respawns.pop(player, None)
+        if player in self.snakes:
+            self.kill(player)
+
+    # Turn the snake of a player on the next tick, a snake cannot turn back
+    def steer(self, player: int, direction: engine.Cell):
+        snake = self.snakes.get(player)
+        if snake is None:
+            return
+        x, y = snake.current_direction
+        if direction != (-x, -y):
+            snake.direction = direction
+
+    # The snakes and the foods as they are now, for the players who join, and
+    # the number of changes made since the last tick. These changes (a player
+    # who left) are already in the snapshot and come first in the next tick.
+    def snapshot(
+        self,
+    ) -> tuple[int, list[tuple[int, engine.Cell, list[int]]], list[int]]:
+        snakes = [
+            (player, snake.current_direction, list(snake.body))
+            for player, snake in self.snakes.items()
+        ]
+        foods = [self.food_cell(food) for food in self.foods]
+        return len(self.events), snakes, foods
+
+    def food_cell(self, food: engine.Food) -> int:
+        return -1 if food.pos is None else self.board.index(*food.pos)
+
+    # Move every snake one cell and return the changes. The snakes move at the
+    # same time: the tails leave their cells first, then a head dies when it
+    # enters a cell that is not EMPTY or that another head enters.
+    def tick(self) -> list[tuple[int, int, int]]:
+        self.ticks += 1
+        board = self.board
+        cells = board.cells
+        events = self.events
+
+        moves = []
+        targets: dict[int, int] = {}
+        for player, snake in self.snakes.items():
+            snake.current_direction = snake.direction
+            target = snake.body[-1] + self.offsets[snake.current_direction]
+            moves.append((player, snake, target))
+            targets[target] = targets.get(target, 0) + 1
+
+        for player, snake, _ in moves:
+            if snake.increase_in_next_tick:
+                snake.increase_in_next_tick = False
+            else:
+                board.clear(snake.body.popleft())
+                events.append((TAIL, player, 0))
+
+        dead = []
+        for player, snake, target in moves:
+            if cells[target] != EMPTY or targets[target] > 1:
+                dead.append(player)
+                continue
+            board.fill(target, SNAKE)
+            snake.body.append(target)
+            events.append((HEAD, player, target))
+            food = self.food_cells.pop(target, None)
+            if food is not None:
+                snake.increase_in_next_tick = True
+                self.place_food(food)
+
+        for player in dead:
+            self.kill(player)
+            self.respawns[player] = self.ticks + RESPAWN_TICKS
+        for player, tick in list(self.respawns.items()):
+            if tick <= self.ticks:
+                self.spawn(player)
+        # Foods that did not fit on the board try again
+        if len(self.food_cells) < len(self.foods):
+            for index, food in enumerate(self.foods):
+                if food.pos is None:
+                    self.place_food(index)
+
+        self.events = []
+        return events
+
+    # Remove the snake of a player from the board
+    def kill(self, player: int):
+        snake = self.snakes.pop(player)
+        for cell in snake.body:
+            self.board.clear(cell)
+        self.events.append((DIE, player, 0))
+
+    # Put a new snake going right on three free cells with a free cell ahead,
+    # the player waits for the next tick when none is found
+    def spawn(self, player: int):
+        board = self.board
+        free = board.free
+        for _ in range(SPAWN_ATTEMPTS):
+            if len(free) == 0:
+                return
+            tail = free[self.rng.randrange(len(free))]
+            body = range(tail, tail + engine.INITIAL_LENGTH + 1)
+            if any(board.cells[cell] != EMPTY for cell in body):
+                continue
+            if any(cell in self.food_cells for cell in body):
+                continue
+            snake = engine.Snake(board, body[:-1])
+            self.snakes[player] = snake
+            del self.respawns[player]
+            self.events.append((SPAWN, player, tail))
+            self.events.extend((HEAD, player, cell) for cell in body[1:-1])
+            return
+
+    # Move a food to a free cell without food, the food is taken off the board
+    # when none is found
+    def place_food(self, index: int):
+        food = self.foods[index]
+        previous = self.food_cell(food)
+        if self.food_cells.get(previous) == index:
+            del self.food_cells[previous]
+        food.pos = None
+        free = self.board.free
+        for _ in range(SPAWN_ATTEMPTS):
+            if len(free) == 0:
+                break
+            cell = free[self.rng.randrange(len(free))]
+            if cell not in self.food_cells:
+                food.update(self.board.position(cell))
+                self.food_cells[cell] = index
+                break
+        cell = self.food_cell(food)
+        if cell != previous:
+            self.events.append((FOOD, index, cell))
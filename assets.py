@@ -0,0 +1,170 @@
+"""
+PySnake assets
+Sprites are sliced from the sprite sheets and scaled to the cell size. The
+scaled sprites are cached on disk as raw pixels for every cell size, so later
+launches skip decoding and scaling the images.
+"""
+
+import hashlib
+import json
+import os
+import struct
+from typing import Optional
+
+import pygame as pg
+
+# Sprite sheets and the size of their tiles
+SHEETS = {
+    "SNAKE": ("resources/sprites/snake_full.png", 64),
+    "FENCES": ("resources/sprites/fences.png", 32),
+}
+
+# Sprites and the sheet, column and row of their tile
+SHEET_SPRITES = {
+    # Head
+    "HEAD_UP": ("SNAKE", 3, 0),
+    "HEAD_DOWN": ("SNAKE", 4, 1),
+    "HEAD_LEFT": ("SNAKE", 3, 1),
+    "HEAD_RIGHT": ("SNAKE", 4, 0),
+    # Body
+    "BODY_HORIZONTAL": ("SNAKE", 1, 0),
+    "BODY_VERTICAL": ("SNAKE", 2, 1),
+    "BODY_TOP_LEFT": ("SNAKE", 0, 0),
+    "BODY_TOP_RIGHT": ("SNAKE", 2, 0),
+    "BODY_BOTTOM_LEFT": ("SNAKE", 0, 1),
+    "BODY_BOTTOM_RIGHT": ("SNAKE", 2, 2),
+    # Tail
+    "TAIL_UP": ("SNAKE", 3, 2),
+    "TAIL_DOWN": ("SNAKE", 4, 3),
+    "TAIL_LEFT": ("SNAKE", 3, 3),
+    "TAIL_RIGHT": ("SNAKE", 4, 2),
+    # Fences
+    "VERTICAL_MID": ("FENCES", 2, 1),
+    "HORIZONTAL_MID": ("FENCES", 1, 3),
+    "TOP_LEFT": ("FENCES", 0, 4),
+    "TOP_RIGHT": ("FENCES", 2, 4),
+    "BOT_LEFT": ("FENCES", 0, 6),
+    "BOT_RIGHT": ("FENCES", 2, 6),
+    # Fence ends, junctions and posts for the walls of the levels
+    "POST": ("FENCES", 0, 0),
+    "TOP_END": ("FENCES", 2, 0),
+    "BOT_END": ("FENCES", 2, 2),
+    "LEFT_END": ("FENCES", 0, 3),
+    "RIGHT_END": ("FENCES", 2, 3),
+    "TOP_MID": ("FENCES", 1, 4),
+    "BOT_MID": ("FENCES", 1, 6),
+    "LEFT_MID": ("FENCES", 0, 5),
+    "RIGHT_MID": ("FENCES", 2, 5),
+    "CROSS": ("FENCES", 1, 5),
+}
+
+# Sprites that are not part of a sheet
+FILE_SPRITES = {
+    "ICON": "resources/icon.png",
+    "FOOD": "resources/sprites/food.png",
+}
+
+# Bump this when the cache layout or the sprite mapping changes
+CACHE_VERSION = 2
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "pysnake")
+
+
+# Identify the source images so the cache is rebuilt when one of them changes
+def source_signature(cell_size: int) -> str:
+    paths = sorted({path for path, _ in SHEETS.values()} | set(FILE_SPRITES.values()))
+    sources = [CACHE_VERSION, cell_size, SHEET_SPRITES, FILE_SPRITES]
+    for path in paths:
+        stat = os.stat(path)
+        sources.append((path, stat.st_size, stat.st_mtime_ns))
+    return hashlib.sha1(json.dumps(sources, sort_keys=True).encode()).hexdigest()
+
+
+# Decode the sheets and the images, slice and scale every sprite
+def build_sprites(cell_size: int) -> dict[str, pg.Surface]:
+    sheets = {name: pg.image.load(path) for name, (path, _) in SHEETS.items()}
+    sprites = {}
+    for name, (sheet, column, row) in SHEET_SPRITES.items():
+        tile_size = SHEETS[sheet][1]
+        tile = sheets[sheet].subsurface(
+            (column * tile_size, row * tile_size, tile_size, tile_size)
+        )
+        sprites[name] = pg.transform.scale(tile, (cell_size, cell_size))
+    for name, path in FILE_SPRITES.items():
+        sprites[name] = pg.transform.scale(pg.image.load(path), (cell_size, cell_size))
+    return sprites
+
+
+# The cache file is a length prefixed JSON header followed by the RGBA pixels of
+# every sprite
+def read_cache(path: str, signature: str) -> Optional[dict[str, pg.Surface]]:
+    try:
+        with open(path, "rb") as cache_file:
+            (header_size,) = struct.unpack("<I", cache_file.read(4))
+            header = json.loads(cache_file.read(header_size))
+            if header["signature"] != signature:
+                return None
+            pixels = cache_file.read()
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+    sprites = {}
+    for name, width, height, offset in header["sprites"]:
+        size = width * height * 4
+        if offset + size > len(pixels):
+            return None
+        sprites[name] = pg.image.frombytes(
+            pixels[offset : offset + size], (width, height), "RGBA"
+        )
+    return sprites
+
+
+def write_cache(path: str, signature: str, sprites: dict[str, pg.Surface]):
+    entries = []
+    chunks = []
+    offset = 0
+    for name, sprite in sprites.items():
+        pixels = pg.image.tobytes(sprite, "RGBA")
+        entries.append((name, sprite.get_width(), sprite.get_height(), offset))
+        chunks.append(pixels)
+        offset += len(pixels)
+    header = json.dumps({"signature": signature, "sprites": entries}).encode()
+
+    # Write to a temporary file first so an interrupted write never leaves a
+    # broken cache behind, a cache that cannot be written is simply skipped
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as cache_file:
+            cache_file.write(struct.pack("<I", len(header)))
+            cache_file.write(header)
+            for chunk in chunks:
+                cache_file.write(chunk)
+        os.replace(temporary_path, path)
+    except OSError:
+        pass
+
+
+# Load every sprite scaled to the cell size, from the disk cache when possible.
+# The sprites are converted to the display format when the display is set up.
+def load_sprites(
+    cell_size: int, cache_dir: Optional[str] = None
+) -> dict[str, pg.Surface]:
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    path = os.path.join(cache_dir, f"sprites_{cell_size}.bin")
+    signature = source_signature(cell_size)
+
+    sprites = read_cache(path, signature)
+    if sprites is None:
+        sprites = build_sprites(cell_size)
+        write_cache(path, signature, sprites)
+
+    if pg.display.get_surface() is not None:
+        sprites = {name: sprite.convert_alpha() for name, sprite in sprites.items()}
+    return sprites
@@ -0,0 +1,357 @@
+"""
+PySnake autopilot
+Plays a game on its own through Game.change_snake_direction. The snake follows
+a cycle over the whole board and takes shortcuts towards the food while they
+keep it in the order of the cycle, which can never trap it. Boards with no such
+cycle (both sides odd) or with the walls of a level are played with A* towards
+the food, a path is only taken when the snake can still reach its tail at the
+end of it. A snake that has not eaten for a long time takes risks to reach the
+food rather than circling forever.
+"""
+
+import heapq
+from array import array
+from collections import deque
+from typing import Optional
+
+import engine
+from engine import EMPTY, Board, Cell
+
+# Shortcuts are never closer than this to the tail of the snake
+SHORTCUT_BUFFER = 3
+# Nodes expanded at most by a search, so a decision fits in a tick on big boards
+MAX_EXPANSIONS = 20_000
+# Ticks without eating, counted in cells of the board, after which the path to
+# the food is taken even when the tail cannot be reached at its end, and after
+# which the snake goes towards the food even when it cannot reach its tail
+HUNGRY = 1
+STARVING = 2
+
+
+# Visit every cell of the board once and come back to the first one. The first
+# row is followed from left to right like the snake does at the start of a game,
+# then the rest of the board back and forth, by rows without the first column
+# when the height is even, by columns otherwise. There is no such cycle when
+# both sides of the board are odd.
+def hamiltonian_cycle(width: int, height: int) -> Optional[list[Cell]]:
+    cycle = [(x, 0) for x in range(width)]
+    if height % 2 == 0:
+        for y in range(1, height):
+            columns = range(width - 1, 0, -1) if y % 2 == 1 else range(1, width)
+            cycle.extend((x, y) for x in columns)
+        cycle.extend((0, y) for y in range(height - 1, 0, -1))
+    elif width % 2 == 0:
+        for x in range(width - 1, -1, -1):
+            rows = range(1, height) if x % 2 == 1 else range(height - 1, 0, -1)
+            cycle.extend((x, y) for y in rows)
+    else:
+        return None
+    return cycle
+
+
+class Search:
+    # A* and BFS over the cells of a board. The buffers are allocated once for a
+    # board size and every search marks the cells it visits with a new
+    # generation number, so they never have to be cleared.
+    def __init__(self, board: Board):
+        size = len(board.cells)
+        self.stride = board.stride
+        self.offsets = tuple(board.offset(direction) for direction in engine.DIRECTIONS)
+        self.generation = 0
+        self.seen = array("I", bytes(4 * size))
+        self.cost = array("i", bytes(4 * size))
+        self.parent = array("i", bytes(4 * size))
+        self.heap: list[tuple[int, int, int]] = []
+        self.queue: deque[int] = deque()
+
+    def next_generation(self) -> int:
+        self.generation += 1
+        return self.generation
+
+    # Shortest path from start to goal over the EMPTY cells, without the start
+    # cell. None when there is no path or when the search takes too long.
+    def path(
+        self, board: Board, start: int, goal: int, max_expansions: int = MAX_EXPANSIONS
+    ) -> Optional[list[int]]:
+        generation = self.next_generation()
+        cells = board.cells
+        seen = self.seen
+        cost = self.cost
+        parent = self.parent
+        stride = self.stride
+        goal_y, goal_x = divmod(goal, stride)
+        heap = self.heap
+        heap.clear()
+
+        seen[start] = generation
+        cost[start] = 0
+        start_y, start_x = divmod(start, stride)
+        distance = abs(start_x - goal_x) + abs(start_y - goal_y)
+        heap.append((distance, distance, start))
+        expansions = 0
+        while heap:
+            estimate, distance, cell = heapq.heappop(heap)
+            if cell == goal:
+                path = []
+                while cell != start:
+                    path.append(cell)
+                    cell = parent[cell]
+                path.reverse()
+                return path
+            steps = estimate - distance
+            # Skip the cells that were reached again by a shorter path
+            if steps > cost[cell]:
+                continue
+            expansions += 1
+            if expansions > max_expansions:
+                return None
+            for offset in self.offsets:
+                neighbour = cell + offset
+                if cells[neighbour] != EMPTY:
+                    continue
+                if seen[neighbour] == generation and cost[neighbour] <= steps + 1:
+                    continue
+                seen[neighbour] = generation
+                cost[neighbour] = steps + 1
+                parent[neighbour] = cell
+                y, x = divmod(neighbour, stride)
+                distance = abs(x - goal_x) + abs(y - goal_y)
+                heapq.heappush(heap, (steps + 1 + distance, distance, neighbour))
+        return None
+
+    # Check if goal can be reached from start. The cells in freed are considered
+    # EMPTY and the ones in taken are not, to look at the board as it will be
+    # after a few moves.
+    def reachable(
+        self,
+        board: Board,
+        start: int,
+        goal: int,
+        freed: set[int],
+        taken: set[int],
+        max_expansions: int = MAX_EXPANSIONS,
+    ) -> bool:
+        generation = self.next_generation()
+        cells = board.cells
+        seen = self.seen
+        queue = self.queue
+        queue.clear()
+        seen[start] = generation
+        queue.append(start)
+        expansions = 0
+        while queue:
+            cell = queue.popleft()
+            expansions += 1
+            if expansions > max_expansions:
+                # Too far to tell, assume the goal is there
+                return True
+            for offset in self.offsets:
+                neighbour = cell + offset
+                if neighbour == goal:
+                    return True
+                if seen[neighbour] == generation or neighbour in taken:
+                    continue
+                if cells[neighbour] != EMPTY and neighbour not in freed:
+                    continue
+                seen[neighbour] = generation
+                queue.append(neighbour)
+        return False
+
+
+class Autopilot:
+    def __init__(self, game: engine.Game, max_expansions: int = MAX_EXPANSIONS):
+        self.game = game
+        self.max_expansions = max_expansions
+        # The board the cycle and the search buffers were made for, they are
+        # kept for the next games as long as the board has the same size
+        self.board: Optional[Board] = None
+        self.search: Optional[Search] = None
+        # Position of every cell in the cycle and the cell after it, None when
+        # the board has no cycle
+        self.order: Optional[array] = None
+        self.cycle_next: Optional[array] = None
+        self.cycle_length = 0
+        # The path to the food that is followed, until the food moves
+        self.path: deque[int] = deque()
+        self.path_food = -1
+        # The length of the snake and the tick it last grew at
+        self.length = 0
+        self.fed = 0
+
+    def prepare(self, board: Board):
+        if self.board is None or len(self.board.cells) != len(board.cells):
+            self.search = Search(board)
+            # The cycle would go through the walls of a level
+            level = self.game.level
+            if level is not None and level.wall_cells:
+                cycle = None
+            else:
+                cycle = hamiltonian_cycle(board.width, board.height)
+            if cycle is None:
+                self.order = self.cycle_next = None
+            else:
+                cells = [board.index(x, y) for x, y in cycle]
+                self.order = array("i", [-1]) * len(board.cells)
+                self.cycle_next = array("i", [-1]) * len(board.cells)
+                for index, cell in enumerate(cells):
+                    self.order[cell] = index
+                    self.cycle_next[cell] = cells[(index + 1) % len(cells)]
+                self.cycle_length = len(cells)
+            self.directions = {board.offset(d): d for d in engine.DIRECTIONS}
+        self.board = board
+        self.path.clear()
+        self.path_food = -1
+
+    # Turn the snake towards the next cell, to be called before every tick
+    def steer(self):
+        game = self.game
+        if game.state != engine.RUNNING:
+            return
+        if game.board is not self.board:
+            self.prepare(game.board)
+
+        # A new game or a restored state starts at an earlier tick
+        length = len(game.snake.body)
+        if length != self.length or game.ticks < self.fed:
+            self.length = length
+            self.fed = game.ticks
+
+        head = game.snake.body[-1]
+        # The main food waits off the board while the other foods cover every
+        # free cell, one of them is taken instead
+        if game.food.pos is not None:
+            food = game.board.index(*game.food.pos)
+        else:
+            food = next(iter(game.foods))
+        if self.order is not None:
+            cell = self.cycle_step(head, food)
+        else:
+            cell = self.search_step(head, food)
+        if cell is not None:
+            game.change_snake_direction(self.directions[cell - head])
+
+    def tick(self) -> list[str]:
+        self.steer()
+        return self.game.tick()
+
+    # Number of times the snake could have gone over every cell of the board
+    # since it last ate
+    def hunger(self) -> int:
+        return (self.game.ticks - self.fed) // (self.board.width * self.board.height)
+
+    # Distance from a cell to another one going forward in the cycle
+    def cycle_distance(self, start: int, end: int) -> int:
+        return (self.order[end] - self.order[start]) % self.cycle_length
+
+    # The body of the snake always goes forward in the cycle from the tail to the
+    # head. The head can jump ahead in the cycle as long as it stays behind the
+    # tail, with room for the snake to grow, and does not jump over the food.
+    def cycle_step(self, head: int, food: int) -> int:
+        snake = self.game.snake
+        cells = self.board.cells
+        free_cells = self.cycle_length - len(snake.body)
+        to_tail = self.cycle_distance(head, snake.body[0])
+        to_food = self.cycle_distance(head, food)
+
+        # Shortcuts are not worth the risk once the snake covers half the board
+        if free_cells < self.cycle_length // 2:
+            available = 0
+        else:
+            available = to_tail - SHORTCUT_BUFFER - snake.increase_in_next_tick
+            if to_food < to_tail:
+                # The snake grows when it eats, leave more room when the tail is
+                # far behind the food
+                available -= 1
+                if (to_tail - to_food) * 4 > free_cells:
+                    available -= 10
+        available = min(available, to_food)
+
+        best = self.cycle_next[head]
+        best_distance = 1
+        for offset in self.directions:
+            neighbour = head + offset
+            if cells[neighbour] != EMPTY:
+                continue
+            distance = self.cycle_distance(head, neighbour)
+            if best_distance < distance <= available:
+                best = neighbour
+                best_distance = distance
+        return best
+
+    def search_step(self, head: int, food: int) -> Optional[int]:
+        board = self.board
+        # Keep following the path while nothing is in its way, its first cell is
+        # dropped once the head is in it
+        path = self.path
+        if path and path[0] == head:
+            path.popleft()
+        if (
+            self.path_food == food
+            and path
+            and path[0] - head in self.directions
+            and board.cells[path[0]] == EMPTY
+        ):
+            return path[0]
+
+        path.clear()
+        self.path_food = food
+        found = self.search.path(board, head, food, self.max_expansions)
+        if found is not None and (
+            self.hunger() >= HUNGRY or self.tail_reachable(found)
+        ):
+            path.extend(found)
+            return path[0]
+        return self.survive(head, food)
+
+    # Look at the board once the snake followed the path and check that its
+    # head can still reach the tail, so the snake is not trapped after eating
+    def tail_reachable(self, path: list[int]) -> bool:
+        snake = self.game.snake
+        body = snake.body
+        # The tail stays in place for the ticks the snake grows
+        dropped = min(len(path) - snake.increase_in_next_tick, len(body))
+        length = len(body) + snake.increase_in_next_tick
+        if dropped < len(body):
+            tail = body[dropped]
+        else:
+            tail = path[len(path) - length]
+        freed = {body[index] for index in range(dropped)}
+        return self.search.reachable(
+            self.board, path[-1], tail, freed, set(path), self.max_expansions
+        )
+
+    # No safe path to the food, go where the tail can still be reached, as far as
+    # possible from the food to leave it room, and then from the walls of the
+    # level so the snake does not get stuck in a corner. A starving snake goes
+    # towards the food first, following its tail could go on forever.
+    def survive(self, head: int, food: int) -> Optional[int]:
+        level = self.game.level
+        wall_distance = level.wall_distance if level is not None else None
+        body = self.game.snake.body
+        grow = self.game.snake.increase_in_next_tick
+        cells = self.board.cells
+        stride = self.board.stride
+        food_y, food_x = divmod(food, stride)
+        tail = body[0] if grow else body[1]
+        freed = set() if grow else {body[0]}
+        starving = self.hunger() >= STARVING
+
+        best = None
+        best_score = None
+        for offset in self.directions:
+            neighbour = head + offset
+            if cells[neighbour] != EMPTY and neighbour not in freed:
+                continue
+            y, x = divmod(neighbour, stride)
+            reachable = self.search.reachable(
+                self.board, neighbour, tail, freed, {neighbour}, self.max_expansions
+            )
+            distance = abs(x - food_x) + abs(y - food_y)
+            score = (
+                (-distance, reachable) if starving else (reachable, distance),
+                wall_distance[neighbour] if wall_distance is not None else 0,
+            )
+            if best_score is None or score > best_score:
+                best = neighbour
+                best_score = score
+        return best
@@ -0,0 +1,171 @@
+"""
+PySnake batched engine
+Steps many independent games at once with NumPy, following the rules of
+engine.Game.tick. Finished games are reset automatically.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+import engine
+
+# Directions are passed to the batch as indices into this tuple
+DIRECTIONS = engine.DIRECTIONS
+UP, DOWN, LEFT, RIGHT = range(4)
+
+# Constants of the splitmix64 generator used for the per game random streams
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+class BatchGame:
+    # Every game owns a row of each array:
+    # grid: the engine.Board cells (EMPTY, SNAKE, WALL) including the wall border
+    # body: ring buffer of the snake cells, the tail is at tail_index and the head at head_index
+    # length, direction, grow: the length of the snake, its direction (index into DIRECTIONS)
+    #   and whether it grows in the next tick
+    # food: the board cell of the food
+    def __init__(
+        self,
+        count: int,
+        width: int,
+        height: int,
+        seeds: Optional[Sequence[int]] = None,
+    ):
+        if width < engine.MIN_BOARD_SIZE or height < engine.MIN_BOARD_SIZE:
+            raise ValueError(
+                f"Board must be at least {engine.MIN_BOARD_SIZE}x{engine.MIN_BOARD_SIZE}, got {width}x{height}"
+            )
+        self.count = count
+        self.width = width
+        self.height = height
+
+        # Reuse the engine board so both engines share the cell layout
+        board = engine.Board(width, height)
+        self.stride = board.stride
+        self.offsets = np.array([board.offset(d) for d in DIRECTIONS], dtype=np.int64)
+        self.play_cells = np.array(
+            [board.index(x, y) for y in range(height) for x in range(width)],
+            dtype=np.int64,
+        )
+        self.initial_body = np.array(
+            [board.index(x, 0) for x in range(engine.INITIAL_LENGTH)], dtype=np.int64
+        )
+        initial_snake = engine.Snake(board)
+        self.initial_grid = np.frombuffer(bytes(board.cells), dtype=np.uint8)
+        self.initial_direction = DIRECTIONS.index(initial_snake.direction)
+
+        self.grid = np.empty((count, len(board.cells)), dtype=np.uint8)
+        self.body = np.zeros((count, width * height), dtype=np.int64)
+        self.tail_index = np.zeros(count, dtype=np.int64)
+        self.head_index = np.zeros(count, dtype=np.int64)
+        self.length = np.zeros(count, dtype=np.int64)
+        self.direction = np.zeros(count, dtype=np.int64)
+        self.grow = np.zeros(count, dtype=bool)
+        self.food = np.zeros(count, dtype=np.int64)
+        self.rng_state = np.zeros(count, dtype=np.uint64)
+        # Score of the games that finished in the last step, before they were reset
+        self.final_score = np.zeros(count, dtype=np.int64)
+
+        self.reset(seeds)
+
+    # Reset every game, optionally reseeding their random streams
+    def reset(self, seeds: Optional[Sequence[int]] = None):
+        if seeds is None:
+            seeds = np.arange(self.count)
+        seeds = np.asarray(seeds, dtype=np.uint64)
+        if seeds.shape != (self.count,):
+            raise ValueError(f"Expected {self.count} seeds, got {seeds.shape[0]}")
+        self.rng_state[:] = seeds
+        self.reset_games(np.arange(self.count))
+
+    # Put the given games back to their starting position with a new food
+    def reset_games(self, index: np.ndarray):
+        if len(index) == 0:
+            return
+        initial_length = len(self.initial_body)
+        self.grid[index] = self.initial_grid
+        self.body[index, :initial_length] = self.initial_body
+        self.tail_index[index] = 0
+        self.head_index[index] = initial_length - 1
+        self.length[index] = initial_length
+        self.direction[index] = self.initial_direction
+        self.grow[index] = False
+        self.food[index], _ = self.spawn_food(index)
+
+    # Draw the next number of the random stream of the given games
+    def next_random(self, index: np.ndarray) -> np.ndarray:
+        state = self.rng_state[index] + _GOLDEN
+        self.rng_state[index] = state
+        z = (state ^ (state >> np.uint64(30))) * _MIX_1
+        z = (z ^ (z >> np.uint64(27))) * _MIX_2
+        return z ^ (z >> np.uint64(31))
+
+    # Pick a uniformly random free cell for the given games, games without any
+    # free cell are reported in the second array
+    def spawn_food(self, index: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        free = self.grid[index][:, self.play_cells] == engine.EMPTY
+        free_count = free.sum(axis=1)
+        full = free_count == 0
+        pick = self.next_random(index) % np.maximum(free_count, 1).astype(np.uint64)
+        slot = np.argmax(
+            np.cumsum(free, axis=1) > pick[:, None].astype(np.int64), axis=1
+        )
+        return self.play_cells[slot], full
+
+    # Advance every game by one tick, directions holds the index of the new
+    # direction of every game (None keeps the current ones).
+    # Returns whether each game ate, finished and won in this tick, finished
+    # games are reset and their score is kept in final_score.
+    def step(
+        self, directions: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        games = np.arange(self.count)
+        capacity = self.body.shape[1]
+        if directions is not None:
+            self.direction[:] = directions
+
+        new_head = self.body[games, self.head_index] + self.offsets[self.direction]
+
+        # The tail leaves its cell unless the snake grows in this tick
+        moving = ~self.grow
+        tail = self.body[games, self.tail_index]
+        self.grid[games[moving], tail[moving]] = engine.EMPTY
+        self.tail_index[moving] = (self.tail_index[moving] + 1) % capacity
+        self.length[self.grow] += 1
+        self.grow[:] = False
+
+        hit = self.grid[games, new_head]
+        self.head_index = (self.head_index + 1) % capacity
+        self.body[games, self.head_index] = new_head
+        entered = hit == engine.EMPTY
+        self.grid[games[entered], new_head[entered]] = engine.SNAKE
+
+        # Same order as engine.Game.tick: win, collision, food
+        won = self.length == self.width * self.height
+        done = won | ~entered
+        ate = ~done & (new_head == self.food)
+
+        eating = games[ate]
+        self.grow[eating] = True
+        food, full = self.spawn_food(eating)
+        self.food[eating[~full]] = food[~full]
+        done[eating[full]] = True
+
+        finished = games[done]
+        self.final_score[finished] = self.length[finished] - engine.INITIAL_LENGTH
+        self.reset_games(finished)
+        return ate, done, won
+
+    def heads(self) -> np.ndarray:
+        return self.positions(self.body[np.arange(self.count), self.head_index])
+
+    # Convert board cells to (x, y) positions
+    def positions(self, cells: np.ndarray) -> np.ndarray:
+        y, x = np.divmod(cells, self.stride)
+        return np.stack((x - 1, y - 1), axis=-1)
+
+    def scores(self) -> np.ndarray:
+        return self.length - engine.INITIAL_LENGTH
@@ -0,0 +1,324 @@
+"""
+PySnake benchmarks
+Times the hot paths of the engine and of the rendering on boards from 4x4 up
+to 1000x1000 with snakes up to the size of the board. Rendering is measured on
+an offscreen surface with the dummy SDL video driver, so no window is opened.
+
+    python bench.py --output baseline.json
+    python bench.py --compare baseline.json
+"""
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import sys
+import time
+from collections import deque
+from random import Random
+from typing import Callable
+
+import pygame as pg
+
+import engine
+import render
+from autopilot import hamiltonian_cycle
+from tournament import parse_size
+
+# Board sizes that are measured by default, every size needs an even width or
+# height so the snake can loop over the whole board
+SIZES = ((4, 4), (16, 16), (64, 64), (256, 256), (1000, 1000))
+# Snake lengths as a fraction of the board, 0 is the length at the start of a game
+LENGTHS = (0, 0.5, 1)
+# Cells visible in the viewport benchmarks, on boards bigger than this
+VIEW_SIZE = (40, 30)
+# A benchmark is slower than its baseline when it takes this much more time
+THRESHOLD = 0.1
+
+
+# Follows the cycle of the board, the snake never dies and keeps its length
+class Track:
+    def __init__(self, width: int, height: int):
+        self.cycle = hamiltonian_cycle(width, height)
+        if self.cycle is None:
+            raise ValueError(f"A {width}x{height} board cannot be looped over")
+        self.directions = [
+            engine.direction_between(cell, self.cycle[(index + 1) % len(self.cycle)])
+            for index, cell in enumerate(self.cycle)
+        ]
+        self.head = 0
+
+    # Replace the body of a snake with the first cells of the cycle
+    def lay(self, snake: engine.Snake, length: int):
+        board = snake.board
+        for cell in snake.body:
+            board.clear(cell)
+        snake.body = deque(board.index(x, y) for x, y in self.cycle[:length])
+        for cell in snake.body:
+            board.fill(cell, engine.SNAKE)
+        self.head = length - 1
+        snake.current_direction = self.directions[self.head - 1]
+        snake.direction = self.directions[self.head]
+        snake.increase_in_next_tick = False
+
+    # Turn the snake towards the next cell of the cycle
+    def steer(self, snake: engine.Snake):
+        snake.direction = self.directions[self.head]
+        self.head = (self.head + 1) % len(self.cycle)
+
+
+def snake_length(width: int, height: int, fraction: float) -> int:
+    return max(engine.INITIAL_LENGTH, round(width * height * fraction))
+
+
+# A game on the track with a snake of the given length. The snake cannot be as
+# long as the board as the game would be won, and the food is taken off the
+# board so it is never eaten.
+def track_game(game: engine.Game, track: Track, length: int) -> engine.Game:
+    game.start(0)
+    track.lay(game.snake, min(length, game.width * game.height - 1))
+    game.place_food(game.food, None)
+    return game
+
+
+# Cells are smaller on big boards so the offscreen surface stays reasonably sized
+def cell_size(width: int, height: int) -> int:
+    return max(1, min(render.CELL_SIZE, 2048 // max(width, height)))
+
+
+def create_view(
+    width: int, height: int, cell_size: int, view_size: tuple[int, int] = (0, 0)
+) -> render.View:
+    layout = render.Layout(width, height, cell_size, *view_size)
+    surface = pg.Surface((layout.screen_width, layout.screen_height)).convert()
+    return render.View(surface, layout)
+
+
+# The operations to time on a board with a snake of the given length
+def cases(width: int, height: int, length: int) -> dict[str, Callable[[], object]]:
+    track = Track(width, height)
+
+    snake = engine.Snake(engine.Board(width, height))
+    track.lay(snake, length)
+
+    def snake_move():
+        track.steer(snake)
+        snake.move()
+
+    game_track = Track(width, height)
+    game = track_game(engine.Game(width, height), game_track, length)
+
+    def game_tick():
+        game_track.steer(game.snake)
+        game.tick()
+
+    board = engine.Board(width, height)
+    Track(width, height).lay(engine.Snake(board), length)
+    rng = Random(0)
+
+    def food_position():
+        engine.generate_food_position(board, 1, rng)
+
+    def big_food_position():
+        engine.generate_food_position(board, 2, rng)
+
+    view = create_view(width, height, cell_size(width, height))
+    render_track = Track(width, height)
+    render_game = track_game(
+        render.Game(width, height, view, seed=0), render_track, length
+    )
+    render_snake = render_game.snake
+    render_snake.reset_parts()
+    render_game.draw()
+
+    def game_draw():
+        render_track.steer(render_game.snake)
+        render_game.tick()
+        render_game.draw()
+
+    operations = {
+        "snake_move": snake_move,
+        "game_tick": game_tick,
+        "generate_food_position": food_position,
+        "generate_food_position_2x2": big_food_position,
+        "snake_draw": render_snake.draw,
+        "game_draw": game_draw,
+        "game_draw_all": render_game.draw_all,
+    }
+
+    # The same game seen through a view that follows the snake, drawing it
+    # should not depend on the size of the board
+    if width > VIEW_SIZE[0] or height > VIEW_SIZE[1]:
+        viewport = create_view(width, height, render.CELL_SIZE, VIEW_SIZE)
+        viewport_track = Track(width, height)
+        viewport_game = track_game(
+            render.Game(width, height, viewport, seed=0), viewport_track, length
+        )
+        viewport_game.snake.reset_parts()
+        viewport_game.draw()
+
+        def viewport_draw():
+            viewport_track.steer(viewport_game.snake)
+            viewport_game.tick()
+            viewport_game.draw()
+
+        operations["viewport_draw"] = viewport_draw
+        operations["viewport_draw_all"] = viewport_game.draw_all
+    return operations
+
+
+# Run the operation in batches long enough to be timed and keep the fastest
+# time per call of a few batches
+def measure(operation: Callable[[], object], min_time: float, repeat: int) -> dict:
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeat or number >= 1 << 20:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed)))
+    timings = [elapsed]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            operation()
+        timings.append(time.perf_counter() - start)
+    return {"seconds": min(timings) / number, "calls": number * repeat}
+
+
+def run(
+    sizes: list[tuple[int, int]],
+    lengths: list[float],
+    names: list[str],
+    min_time: float,
+    repeat: int,
+) -> list[dict]:
+    results = []
+    for width, height in sizes:
+        for fraction in lengths:
+            length = snake_length(width, height, fraction)
+            for name, operation in cases(width, height, length).items():
+                if names and name not in names:
+                    continue
+                result = {
+                    "id": f"{name}/{width}x{height}/{length}",
+                    "name": name,
+                    "width": width,
+                    "height": height,
+                    "length": length,
+                }
+                result.update(measure(operation, min_time, repeat))
+                results.append(result)
+                print(
+                    f"{result['id']:<48} {format_time(result['seconds']):>12}",
+                    file=sys.stderr,
+                )
+    return results
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+# Print the change of every benchmark against the baseline and return the ones
+# that got slower by more than the threshold
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    previous = {result["id"]: result for result in baseline}
+    slower = []
+    for result in results:
+        before = previous.get(result["id"])
+        if before is None:
+            print(f"{result['id']:<48} {'new':>12}")
+            continue
+        change = result["seconds"] / before["seconds"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  SLOWER"
+            slower.append(result["id"])
+        elif change < -threshold:
+            flag = "  faster"
+        print(
+            f"{result['id']:<48} {format_time(before['seconds']):>12} "
+            f"{format_time(result['seconds']):>12} {change:>+8.1%}{flag}"
+        )
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PySnake benchmarks")
+    parser.add_argument(
+        "--sizes",
+        type=parse_size,
+        nargs="+",
+        default=list(SIZES),
+        metavar="WxH",
+        help="board sizes to measure",
+    )
+    parser.add_argument(
+        "--lengths",
+        type=float,
+        nargs="+",
+        default=list(LENGTHS),
+        metavar="FRACTION",
+        help="snake lengths as a fraction of the board",
+    )
+    parser.add_argument(
+        "--only", nargs="+", default=[], metavar="NAME", help="benchmarks to run"
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="seconds spent timing every benchmark",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="number of batches")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument(
+        "--compare", metavar="BASELINE", help="JSON results to compare against"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="relative slowdown that fails the comparison",
+    )
+    args = parser.parse_args()
+
+    pg.init()
+    # The sprites and the offscreen surfaces are converted to the display format
+    pg.display.set_mode((1, 1))
+    results = run(args.sizes, args.lengths, args.only, args.min_time, args.repeat)
+    pg.quit()
+
+    report = {
+        "python": platform.python_version(),
+        "pygame": pg.version.ver,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    elif not args.compare:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            slower = compare(results, json.load(baseline)["results"], args.threshold)
+        if slower:
+            print(f"{len(slower)} benchmarks are slower than the baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,926 @@
+"""
+PySnake engine
+Headless game rules, this module does not depend on pygame so the game can be
+simulated without a display, an audio device or a TTY.
+"""
+
+import struct
+import time
+from array import array
+from collections import deque
+from random import Random
+from typing import (
+    Callable,
+    Container,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+Cell = Tuple[int, int]
+
+# Direction constants
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+
+# Game states
+# NOT_YET_STARTED: The game has not started yet
+# RUNNING: The game is running
+# PAUSED: The game is paused
+# GAME_OVER: The game is over
+NOT_YET_STARTED = "NOT_YET_STARTED"
+RUNNING = "RUNNING"
+PAUSED = "PAUSED"
+GAME_OVER = "GAME_OVER"
+STATES = (NOT_YET_STARTED, RUNNING, PAUSED, GAME_OVER)
+
+# Events returned by Game.tick
+# EAT: The snake ate the food
+# WIN: The snake covers the whole board
+# DIE: The snake hit itself or the boundaries
+EAT = "EAT"
+WIN = "WIN"
+DIE = "DIE"
+
+# The smallest board the game can be played on
+MIN_BOARD_SIZE = 4
+# The length of the snake when the game starts
+INITIAL_LENGTH = 3
+# Turns that can wait for the next ticks, a tick takes one of them
+MAX_QUEUED_TURNS = 3
+# Number of input to move latencies kept for the percentiles
+LATENCY_HISTORY = 256
+
+
+# Contents of a board cell
+EMPTY = 0
+SNAKE = 1
+WALL = 2
+
+
+# Check if the target is within the boundaries of the top_left and bottom_right
+def check_collision(target: Cell, top_left: Cell, bottom_right: Cell) -> bool:
+    return (
+        top_left[0] <= target[0] < bottom_right[0]
+        and top_left[1] <= target[1] < bottom_right[1]
+    )
+
+
+# Get the direction to go from one cell to the next one
+def direction_between(start: Cell, end: Cell) -> Cell:
+    return end[0] - start[0], end[1] - start[1]
+
+
+class Board:
+    # Occupancy grid of the play area surrounded by a one cell thick wall.
+    # Cells are addressed by a single integer so that a step in any direction is
+    # an integer offset, and a head that leaves the play area lands on a WALL cell.
+    # The EMPTY cells are also kept in a dense list (with the slot of every cell
+    # in that list) so they can be picked at random and updated in O(1). Both
+    # are int arrays, a board is copied with a few memcpy.
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.stride = width + 2
+        self.cells = bytearray([WALL]) * (self.stride * (height + 2))
+        self.free = array("i")
+        self.slots = array("i", [-1]) * len(self.cells)
+        for y in range(height):
+            start = self.index(0, y)
+            self.cells[start : start + width] = bytes(width)
+            for cell in range(start, start + width):
+                self.slots[cell] = len(self.free)
+                self.free.append(cell)
+
+    def index(self, x: int, y: int) -> int:
+        return (y + 1) * self.stride + x + 1
+
+    def position(self, cell: int) -> Cell:
+        y, x = divmod(cell, self.stride)
+        return x - 1, y - 1
+
+    def offset(self, direction: Cell) -> int:
+        return direction[1] * self.stride + direction[0]
+
+    # Put something in an EMPTY cell, the cell is swapped out of the free list
+    def fill(self, cell: int, content: int):
+        self.cells[cell] = content
+        slot = self.slots[cell]
+        last = self.free.pop()
+        if last != cell:
+            self.free[slot] = last
+            self.slots[last] = slot
+        self.slots[cell] = -1
+
+    # Empty a filled cell and give it back to the free list
+    def clear(self, cell: int):
+        self.cells[cell] = EMPTY
+        self.slots[cell] = len(self.free)
+        self.free.append(cell)
+
+    # A copy that can be changed without changing this board
+    def copy(self) -> "Board":
+        board = Board.__new__(Board)
+        board.width = self.width
+        board.height = self.height
+        board.stride = self.stride
+        board.cells = bytearray(self.cells)
+        board.free = self.free[:]
+        board.slots = self.slots[:]
+        return board
+
+    # Replace the content of the board in place, from the bytes of its cells and
+    # of its arrays
+    def load(self, cells: bytes, free: bytes, slots: bytes):
+        self.cells[:] = cells
+        del self.free[:]
+        self.free.frombytes(free)
+        del self.slots[:]
+        self.slots.frombytes(slots)
+
+    def is_full(self) -> bool:
+        return len(self.free) == 0
+
+    # Check if the size x size square with the given top left cell is inside the
+    # play area and completely empty
+    def is_area_free(self, cell: int, size: int) -> bool:
+        x, y = self.position(cell)
+        if x + size > self.width or y + size > self.height:
+            return False
+        cells = self.cells
+        for row in range(cell, cell + size * self.stride, self.stride):
+            if any(cells[row : row + size]):
+                return False
+        return True
+
+
+# Characters of the level files, every line of a file is a row of the board
+LEVEL_WALL = "#"
+LEVEL_EMPTY = "."
+
+
+class Level:
+    # Walls inside the play area, stored as a bitmap of one bit per cell row by
+    # row. Everything the games of the level need is computed once here: the
+    # board with its walls and its list of free cells, which every game copies,
+    # and the distance from every cell to the closest wall.
+    def __init__(self, width: int, height: int, walls: bytes, name: str = ""):
+        if width < MIN_BOARD_SIZE or height < MIN_BOARD_SIZE:
+            raise ValueError(
+                f"Level must be at least {MIN_BOARD_SIZE}x{MIN_BOARD_SIZE}, got {width}x{height}"
+            )
+        if len(walls) != (width * height + 7) // 8:
+            raise ValueError(f"Wall bitmap of {len(walls)} bytes for {width}x{height}")
+        self.width = width
+        self.height = height
+        self.name = name
+        self.walls = bytes(walls)
+
+        board = Board(width, height)
+        # Board cells of the walls, from the top left to the bottom right
+        self.wall_cells = [
+            board.index(x, y)
+            for y in range(height)
+            for x in range(width)
+            if self.is_wall(x, y)
+        ]
+        for cell in self.wall_cells:
+            board.fill(cell, WALL)
+        # The snake starts on the top left going right, like on an empty board
+        for x in range(INITIAL_LENGTH + 1):
+            if self.is_wall(x, 0):
+                raise ValueError(
+                    f"The first {INITIAL_LENGTH + 1} cells of the top row must be empty"
+                )
+        self.board = board
+        self.open_cells = len(board.free)
+        self.wall_distance = wall_distance_field(board)
+
+    def is_wall(self, x: int, y: int) -> bool:
+        index = y * self.width + x
+        return self.walls[index >> 3] >> (index & 7) & 1 == 1
+
+
+# Number of steps from every board cell to the closest WALL cell, the border
+# included, going through the other cells
+def wall_distance_field(board: Board) -> array:
+    cells = board.cells
+    distance = array("i", [-1]) * len(cells)
+    queue = deque()
+    for cell, content in enumerate(cells):
+        if content == WALL:
+            distance[cell] = 0
+            queue.append(cell)
+    offsets = [board.offset(direction) for direction in DIRECTIONS]
+    while queue:
+        cell = queue.popleft()
+        for offset in offsets:
+            neighbour = cell + offset
+            if 0 <= neighbour < len(cells) and distance[neighbour] < 0:
+                distance[neighbour] = distance[cell] + 1
+                queue.append(neighbour)
+    return distance
+
+
+def parse_level(text: str, name: str = "") -> Level:
+    rows = [line.rstrip() for line in text.splitlines()]
+    while rows and not rows[-1]:
+        rows.pop()
+    if not rows:
+        raise ValueError(f"Level {name!r} is empty")
+    width = len(rows[0])
+    height = len(rows)
+    walls = bytearray((width * height + 7) // 8)
+    for y, row in enumerate(rows):
+        if len(row) != width:
+            raise ValueError(
+                f"Row {y + 1} of level {name!r} has {len(row)} cells, expected {width}"
+            )
+        for x, character in enumerate(row):
+            if character == LEVEL_WALL:
+                index = y * width + x
+                walls[index >> 3] |= 1 << (index & 7)
+            elif character != LEVEL_EMPTY:
+                raise ValueError(
+                    f"Unknown cell {character!r} in row {y + 1} of level {name!r}"
+                )
+    return Level(width, height, walls, name)
+
+
+def load_level(path: str) -> Level:
+    with open(path) as level_file:
+        return parse_level(level_file.read(), path)
+
+
+# How many random cells are tried for a multi-cell food before scanning the free cells
+FOOD_PLACEMENT_ATTEMPTS = 32
+
+
+# Check if a food of the given size fits with its top left in a free cell of the
+# board, without covering a filled cell or the cells of another food
+def food_fits(board: Board, cell: int, size: int, food_cells: Container[int]) -> bool:
+    if size == 1:
+        return cell not in food_cells
+    if not board.is_area_free(cell, size):
+        return False
+    stride = board.stride
+    for row in range(cell, cell + size * stride, stride):
+        for covered in range(row, row + size):
+            if covered in food_cells:
+                return False
+    return True
+
+
+# Generate a random position for the food that is not colliding with the snake
+# or with the cells of the other foods
+def generate_food_position(
+    board: Board, size: int, rng: Random, food_cells: Container[int] = ()
+) -> Optional[Cell]:
+    free_cells = board.free
+    if len(free_cells) == 0:
+        return None
+
+    # Try random top left cells first and only scan the free cells when the
+    # board is too crowded for that. A food of one cell with no other food
+    # around always fits on the first try.
+    for _ in range(FOOD_PLACEMENT_ATTEMPTS):
+        cell = free_cells[rng.randrange(len(free_cells))]
+        if food_fits(board, cell, size, food_cells):
+            return board.position(cell)
+    anchors = [cell for cell in free_cells if food_fits(board, cell, size, food_cells)]
+    if len(anchors) == 0:
+        return None
+    return board.position(anchors[rng.randrange(len(anchors))])
+
+
+class Snake:
+    # The snake starts on the top left of the board going right, unless it is
+    # given its cells (from the tail to the head) and its direction
+    def __init__(
+        self,
+        board: Board,
+        cells: Optional[Iterable[int]] = None,
+        direction: Cell = RIGHT,
+    ):
+        self.board = board
+        if cells is None:
+            cells = (board.index(x, 0) for x in range(INITIAL_LENGTH))
+        # The cells of the snake, the tail is the first element and the head is the last
+        self.body: deque[int] = deque(cells)
+        for cell in self.body:
+            board.fill(cell, SNAKE)
+        # The intended direction of the snake, this will be updated to the current direction every tick
+        self.direction = direction
+        # The current direction of the snake
+        self.current_direction = direction
+        # Flag to increase the length of the snake
+        self.increase_in_next_tick = False
+
+    # A copy of the snake on a copy of its board
+    def copy(self, board: Board) -> "Snake":
+        snake = Snake.__new__(Snake)
+        snake.board = board
+        snake.body = self.body.copy()
+        snake.direction = self.direction
+        snake.current_direction = self.current_direction
+        snake.increase_in_next_tick = self.increase_in_next_tick
+        return snake
+
+    def head(self) -> Cell:
+        return self.board.position(self.body[-1])
+
+    # Iterate over the positions of the body from the tail to the head
+    def positions(self) -> Iterator[Cell]:
+        position = self.board.position
+        for cell in self.body:
+            yield position(cell)
+
+    # Move the snake one cell forward and return what was in the cell the head entered
+    def move(self) -> int:
+        # Update the current direction
+        self.current_direction = self.direction
+
+        board = self.board
+        new_head = self.body[-1] + board.offset(self.current_direction)
+
+        # Increase the length of the snake if the flag is set and clear the flag,
+        # otherwise the tail leaves its cell before the head enters the new one
+        if self.increase_in_next_tick:
+            self.increase_in_next_tick = False
+        else:
+            board.clear(self.body.popleft())
+
+        hit = board.cells[new_head]
+        if hit == EMPTY:
+            board.fill(new_head, SNAKE)
+        self.body.append(new_head)
+        return hit
+
+
+class Food:
+    # size of the food intended to make the food bigger (like the childhood Nokia snake game)
+    def __init__(self, pos: Optional[Cell], size: int = 1):
+        self.pos = pos
+        self.size = size
+        # Index of the kind of the food in Game.food_kinds, -1 for the main food
+        self.kind = -1
+        # The tick at which the food disappears when it is not eaten, None when it stays
+        self.expires: Optional[int] = None
+
+    def update(self, pos: Cell):
+        self.pos = pos
+
+    # Iterate over the positions the food covers
+    def positions(self) -> Iterator[Cell]:
+        x, y = self.pos
+        for dy in range(self.size):
+            for dx in range(self.size):
+                yield x + dx, y + dy
+
+    # The board cells the food covers
+    def cells(self, board: Board) -> list[int]:
+        start = board.index(*self.pos)
+        if self.size == 1:
+            return [start]
+        stride = board.stride
+        return [
+            cell
+            for row in range(start, start + self.size * stride, stride)
+            for cell in range(row, row + self.size)
+        ]
+
+
+# Foods that are on the board next to the main food. count foods of the kind are
+# kept on the board, a missing one comes back with the given chance every tick.
+# A food with a lifetime disappears after that many ticks when it is not eaten.
+class FoodKind(NamedTuple):
+    count: int
+    size: int = 1
+    lifetime: int = 0
+    chance: float = 1.0
+
+
+# A big food that shows up now and then and does not stay long, like the bonus
+# food of the Nokia snake game
+BONUS_FOOD = FoodKind(1, size=2, lifetime=25, chance=0.02)
+
+
+# Everything that changes during a game, made of immutable values so a state
+# can be kept and restored any number of times. The board is stored as it is,
+# with the order of its free cells, so a restored game places the food exactly
+# like the original one. The random generator is shared with the game and
+# copied by whichever draws from it first, see Game.spawn_food.
+class GameState(NamedTuple):
+    width: int
+    height: int
+    state: str
+    ticks: int
+    seed: int
+    rng: Random
+    body: tuple[int, ...]
+    direction: Cell
+    current_direction: Cell
+    grow: bool
+    food: Optional[Cell]
+    food_size: int
+    cells: bytes
+    free: bytes
+    slots: bytes
+    # The other foods as (top left cell, size, kind, expiry tick or -1), the
+    # number of foods of every kind that are not on the board, and the sizes of
+    # the foods that did not fit since a food last left the board
+    extra_foods: tuple[tuple[int, int, int, int], ...] = ()
+    missing: tuple[int, ...] = ()
+    crowded: tuple[int, ...] = ()
+
+
+# Serialized states start with this header:
+# magic, version, width, height, state, ticks, seed, direction, current direction,
+# grow flag, food cell (-1 without food), food size, snake length, free cells,
+# other foods, food kinds, crowded sizes. Then come the random generator, the
+# cells of the snake, the free cells, the other foods, the missing foods of every
+# kind and the crowded sizes as 32 bits integers in the byte order of the
+# machine, and the board cells.
+STATE_HEADER = struct.Struct("<4sBHHBIQBB?iBIIIBB")
+STATE_MAGIC = b"PSNS"
+STATE_VERSION = 3
+# The state of a Random is its version, 624 words and a position
+RNG_STATE = struct.Struct("<I625I")
+
+
+def encode_state(state: GameState) -> bytes:
+    stride = state.width + 2
+    food = -1
+    if state.food is not None:
+        food = (state.food[1] + 1) * stride + state.food[0] + 1
+    header = STATE_HEADER.pack(
+        STATE_MAGIC,
+        STATE_VERSION,
+        state.width,
+        state.height,
+        STATES.index(state.state),
+        state.ticks,
+        state.seed,
+        DIRECTIONS.index(state.direction),
+        DIRECTIONS.index(state.current_direction),
+        state.grow,
+        food,
+        state.food_size,
+        len(state.body),
+        len(state.free) // 4,
+        len(state.extra_foods),
+        len(state.missing),
+        len(state.crowded),
+    )
+    version, words, _ = state.rng.getstate()
+    extra_foods = array("i")
+    for extra_food in state.extra_foods:
+        extra_foods.extend(extra_food)
+    return b"".join(
+        (
+            header,
+            RNG_STATE.pack(version, *words),
+            array("I", state.body).tobytes(),
+            state.free,
+            extra_foods.tobytes(),
+            array("i", state.missing).tobytes(),
+            array("i", state.crowded).tobytes(),
+            state.cells,
+        )
+    )
+
+
+def decode_state(data: bytes) -> GameState:
+    (
+        magic,
+        version,
+        width,
+        height,
+        state,
+        ticks,
+        seed,
+        direction,
+        current_direction,
+        grow,
+        food,
+        food_size,
+        length,
+        free_count,
+        extra_food_count,
+        kind_count,
+        crowded_count,
+    ) = STATE_HEADER.unpack_from(data)
+    if magic != STATE_MAGIC or version != STATE_VERSION:
+        raise ValueError("Not a game state")
+    offset = STATE_HEADER.size
+    rng_version, *words = RNG_STATE.unpack_from(data, offset)
+    offset += RNG_STATE.size
+    body = array("I")
+    body.frombytes(data[offset : offset + 4 * length])
+    offset += 4 * length
+    free = bytes(data[offset : offset + 4 * free_count])
+    offset += 4 * free_count
+    extra_foods = array("i")
+    extra_foods.frombytes(data[offset : offset + 16 * extra_food_count])
+    offset += 16 * extra_food_count
+    missing = array("i")
+    missing.frombytes(data[offset : offset + 4 * kind_count])
+    offset += 4 * kind_count
+    crowded = array("i")
+    crowded.frombytes(data[offset : offset + 4 * crowded_count])
+    offset += 4 * crowded_count
+    cells = bytes(data[offset:])
+    if len(cells) != (width + 2) * (height + 2):
+        raise ValueError("Truncated game state")
+
+    # The slots are the inverse of the free list, they are not stored
+    slots = array("i", [-1]) * len(cells)
+    for slot, cell in enumerate(array("i", free)):
+        slots[cell] = slot
+    stride = width + 2
+    rng = Random()
+    rng.setstate((rng_version, tuple(words), None))
+    return GameState(
+        width,
+        height,
+        STATES[state],
+        ticks,
+        seed,
+        rng,
+        tuple(body),
+        DIRECTIONS[direction],
+        DIRECTIONS[current_direction],
+        grow,
+        None if food < 0 else (food % stride - 1, food // stride - 1),
+        food_size,
+        cells,
+        free,
+        slots.tobytes(),
+        tuple(
+            tuple(extra_foods[index : index + 4])
+            for index in range(0, len(extra_foods), 4)
+        ),
+        tuple(missing),
+        tuple(crowded),
+    )
+
+
+class Game:
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        seed: Optional[int] = None,
+        clock: Callable[[], float] = time.perf_counter,
+        food_kinds: Sequence[FoodKind] = (),
+        level: Optional[Level] = None,
+    ):
+        if width < MIN_BOARD_SIZE or height < MIN_BOARD_SIZE:
+            raise ValueError(
+                f"Board must be at least {MIN_BOARD_SIZE}x{MIN_BOARD_SIZE}, got {width}x{height}"
+            )
+        if level is not None and (level.width, level.height) != (width, height):
+            raise ValueError(
+                f"Level is {level.width}x{level.height}, got a {width}x{height} board"
+            )
+        self.width = width
+        self.height = height
+        # The walls of the level are on the board of every game, the snake wins
+        # when it covers every other cell
+        self.level = level
+        self.open_cells = width * height if level is None else level.open_cells
+        # Every game draws its own seed from this generator, a game can then be
+        # reproduced from its seed and the direction changes of the snake
+        self.seeds = Random(seed)
+        self.seed = self.seeds.getrandbits(64)
+        self.rng = Random(self.seed)
+        # The generator is shared with snapshots or clones, it has to be copied
+        # before drawing from it
+        self.rng_shared = False
+        self.state = NOT_YET_STARTED
+        # Turns waiting for the next ticks with the time they were queued, and the
+        # time between queuing a turn and the snake moving in its direction
+        self.clock = clock
+        self.turns: deque[tuple[Cell, float]] = deque()
+        self.turn_latencies: deque[float] = deque(maxlen=LATENCY_HISTORY)
+        # Kinds of the foods that are on the board next to the main food
+        self.food_kinds = tuple(food_kinds)
+        self.init()
+
+    def init(self):
+        # The number of ticks played in the current game
+        self.ticks = 0
+        self.turns.clear()
+        if self.level is None:
+            self.board = Board(self.width, self.height)
+        else:
+            self.board = self.level.board.copy()
+        self.snake = self.create_snake()
+        # The foods on the board by their top left cell, and the food covering
+        # every cell so the food the head enters is found in O(1)
+        self.foods: dict[int, Food] = {}
+        self.food_cells: dict[int, Food] = {}
+        # Foods with a lifetime by the tick at which they disappear, and the
+        # number of foods of every kind that are not on the board
+        self.expiries: dict[int, list[Food]] = {}
+        self.missing = [kind.count for kind in self.food_kinds]
+        # Sizes of the foods that did not fit, they are not tried again before a
+        # food leaves the board so a crowded board is not scanned on every tick
+        self.crowded: set[int] = set()
+        self.food = self.create_food(None, 1)
+        self.place_food(self.food, self.spawn_food(1))
+        if self.food_kinds:
+            self.refill_foods()
+
+    # Factories for the game objects, front-ends override these to attach drawing
+    def create_snake(self) -> Snake:
+        return Snake(self.board)
+
+    def create_food(self, pos: Optional[Cell], size: int) -> Food:
+        return Food(pos, size)
+
+    def start(self, seed: Optional[int] = None):
+        self.seed = self.seeds.getrandbits(64) if seed is None else seed
+        self.rng = Random(self.seed)
+        self.rng_shared = False
+        self.init()
+        self.state = RUNNING
+
+    # The random generator of the game, copied first when it is shared
+    def own_rng(self) -> Random:
+        if self.rng_shared:
+            rng = Random()
+            rng.setstate(self.rng.getstate())
+            self.rng = rng
+            self.rng_shared = False
+        return self.rng
+
+    def spawn_food(self, size: int) -> Optional[Cell]:
+        if size in self.crowded:
+            return None
+        pos = generate_food_position(self.board, size, self.own_rng(), self.food_cells)
+        if pos is None:
+            self.crowded.add(size)
+        return pos
+
+    # Move a food to a position, None takes it off the board. Every cell the
+    # food covers is indexed.
+    def place_food(self, food: Food, pos: Optional[Cell]):
+        board = self.board
+        food_cells = self.food_cells
+        if food.pos is not None:
+            del self.foods[board.index(*food.pos)]
+            for cell in food.cells(board):
+                del food_cells[cell]
+            # The cells it leaves may make room for the foods that did not fit
+            self.crowded.clear()
+        food.update(pos)
+        if pos is not None:
+            self.foods[board.index(*pos)] = food
+            for cell in food.cells(board):
+                food_cells[cell] = food
+
+    # Put back the missing foods of every kind, each one with the chance of its kind
+    def refill_foods(self):
+        missing = self.missing
+        for index, kind in enumerate(self.food_kinds):
+            for _ in range(missing[index]):
+                if kind.chance < 1 and self.own_rng().random() >= kind.chance:
+                    continue
+                pos = self.spawn_food(kind.size)
+                if pos is None:
+                    break
+                food = self.create_food(None, kind.size)
+                food.kind = index
+                if kind.lifetime > 0:
+                    food.expires = self.ticks + kind.lifetime
+                    self.expiries.setdefault(food.expires, []).append(food)
+                self.place_food(food, pos)
+                missing[index] -= 1
+
+    # Take the foods whose lifetime ended off the board, the foods that were
+    # eaten in the meantime are already off the board
+    def expire_foods(self):
+        for food in self.expiries.pop(self.ticks, ()):
+            if food.pos is not None:
+                self.place_food(food, None)
+                self.missing[food.kind] += 1
+
+    def tick(self) -> list[str]:
+        if self.state != RUNNING:
+            return []
+
+        self.ticks += 1
+        if self.turns:
+            self.take_turn()
+        hit = self.snake.move()
+
+        # Check if the snake cover the whole board
+        if self.is_won():
+            self.state = GAME_OVER
+            return [WIN]
+
+        # Check if the snake has collided with itself or the boundaries
+        if hit != EMPTY:
+            self.state = GAME_OVER
+            return [DIE]
+
+        # Check if the snake has collided with a food, the main food moves and
+        # the others are put back later. The main food only has nowhere to go
+        # when the other foods cover every free cell, it waits off the board
+        # for a cell to be free then.
+        events = []
+        food = self.food_cells.get(self.snake.body[-1])
+        if food is not None:
+            self.snake.increase_in_next_tick = True
+            events.append(EAT)
+            self.place_food(food, None)
+            if food is self.food:
+                self.place_food(food, self.spawn_food(food.size))
+            else:
+                self.missing[food.kind] += 1
+
+        if self.food_kinds:
+            self.expire_foods()
+            if self.food.pos is None:
+                self.place_food(self.food, self.spawn_food(self.food.size))
+            self.refill_foods()
+        return events
+
+    def snapshot(self) -> GameState:
+        board = self.board
+        snake = self.snake
+        return GameState(
+            self.width,
+            self.height,
+            self.state,
+            self.ticks,
+            self.seed,
+            self.share_rng(),
+            tuple(snake.body),
+            snake.direction,
+            snake.current_direction,
+            snake.increase_in_next_tick,
+            self.food.pos,
+            self.food.size,
+            bytes(board.cells),
+            board.free.tobytes(),
+            board.slots.tobytes(),
+            self.extra_food_state(),
+            tuple(self.missing),
+            tuple(sorted(self.crowded)),
+        )
+
+    def extra_food_state(self) -> tuple[tuple[int, int, int, int], ...]:
+        return tuple(
+            (cell, food.size, food.kind, -1 if food.expires is None else food.expires)
+            for cell, food in self.foods.items()
+            if food is not self.food
+        )
+
+    # Put the foods on the board, the main food object is kept
+    def load_foods(
+        self,
+        pos: Optional[Cell],
+        size: int,
+        extra_foods: tuple[tuple[int, int, int, int], ...],
+        missing: tuple[int, ...],
+    ):
+        if len(missing) != len(self.food_kinds):
+            raise ValueError(
+                f"State has {len(missing)} food kinds, the game has {len(self.food_kinds)}"
+            )
+        self.foods.clear()
+        self.food_cells.clear()
+        self.expiries.clear()
+        self.missing = list(missing)
+        self.food.pos = None
+        self.food.size = size
+        self.place_food(self.food, pos)
+        for cell, size, kind, expires in extra_foods:
+            food = self.create_food(None, size)
+            food.kind = kind
+            if expires >= 0:
+                food.expires = expires
+                self.expiries.setdefault(expires, []).append(food)
+            self.place_food(food, self.board.position(cell))
+
+    # Put the game back in a state, the board, the snake and the food are
+    # updated in place so the objects that refer to them stay valid
+    def restore(self, state: GameState):
+        if (state.width, state.height) != (self.width, self.height):
+            raise ValueError(
+                f"State is for a {state.width}x{state.height} board, got {self.width}x{self.height}"
+            )
+        self.state = state.state
+        self.ticks = state.ticks
+        self.seed = state.seed
+        self.rng = state.rng
+        self.rng_shared = True
+        self.board.load(state.cells, state.free, state.slots)
+        snake = self.snake
+        snake.body.clear()
+        snake.body.extend(state.body)
+        snake.direction = state.direction
+        snake.current_direction = state.current_direction
+        snake.increase_in_next_tick = state.grow
+        self.load_foods(state.food, state.food_size, state.extra_foods, state.missing)
+        self.crowded = set(state.crowded)
+        self.turns.clear()
+
+    # A headless copy of the game that can be played without changing this one,
+    # made without going through the setup of a new board
+    def clone(self) -> "Game":
+        game = Game.__new__(Game)
+        game.width = self.width
+        game.height = self.height
+        game.level = self.level
+        game.open_cells = self.open_cells
+        game.seeds = self.seeds
+        game.seed = self.seed
+        game.rng = self.share_rng()
+        game.rng_shared = True
+        game.state = self.state
+        game.ticks = self.ticks
+        game.clock = self.clock
+        game.turns = deque()
+        game.turn_latencies = deque(maxlen=LATENCY_HISTORY)
+        game.board = self.board.copy()
+        game.snake = self.snake.copy(game.board)
+        game.food_kinds = self.food_kinds
+        game.foods = {}
+        game.food_cells = {}
+        game.expiries = {}
+        game.food = Food(None, self.food.size)
+        game.crowded = set(self.crowded)
+        game.load_foods(
+            self.food.pos,
+            self.food.size,
+            self.extra_food_state(),
+            tuple(self.missing),
+        )
+        return game
+
+    def share_rng(self) -> Random:
+        self.rng_shared = True
+        return self.rng
+
+    # Queue a turn for the next tick without a turn, it is refused when it would
+    # not turn the snake from the direction it will have after the queued turns
+    # or when the queue is full. Return whether it was queued.
+    def queue_turn(self, direction: Cell) -> bool:
+        if self.state != RUNNING or len(self.turns) >= MAX_QUEUED_TURNS:
+            return False
+        last = self.turns[-1][0] if self.turns else self.snake.direction
+        if direction == last or direction == (-last[0], -last[1]):
+            return False
+        self.turns.append((direction, self.clock()))
+        return True
+
+    # The snake takes the oldest queued turn, unless its direction was changed
+    # in the meantime and the turn would send it back on itself
+    def take_turn(self):
+        direction, queued_at = self.turns.popleft()
+        x, y = self.snake.current_direction
+        if direction == (-x, -y):
+            return
+        self.snake.direction = direction
+        self.turn_latencies.append(self.clock() - queued_at)
+
+    # Input to move latencies of the last turns, in seconds, by percentile
+    def turn_latency_percentiles(
+        self, percentiles: Iterable[int] = (50, 90, 99)
+    ) -> dict[int, float]:
+        latencies = sorted(self.turn_latencies)
+        if not latencies:
+            return {}
+        return {
+            percentile: latencies[
+                min(len(latencies) * percentile // 100, len(latencies) - 1)
+            ]
+            for percentile in percentiles
+        }
+
+    def change_snake_direction(self, direction: Cell):
+        self.snake.direction = direction
+
+    def get_snake_direction(self) -> Cell:
+        return self.snake.current_direction
+
+    def on_space_pressed(self):
+        if self.state == GAME_OVER or self.state == NOT_YET_STARTED:
+            self.start()
+        else:
+            self.state = PAUSED if self.state == RUNNING else RUNNING
+
+    def is_won(self) -> bool:
+        return len(self.snake.body) == self.open_cells
+
+    def score(self) -> int:
+        return len(self.snake.body) - INITIAL_LENGTH
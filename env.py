@@ -0,0 +1,170 @@
+"""
+PySnake environment
+Gym-style reset()/step(action) interface over engine.Game for reinforcement
+learning. Observations are NumPy arrays allocated once and updated in place,
+a step only writes the few cells that changed.
+
+    env = SnakeEnv(20, 20, seed=0)
+    observation, info = env.reset()
+    observation, reward, terminated, truncated, info = env.step(action)
+"""
+
+from typing import Optional
+
+import numpy as np
+
+import engine
+
+# Channels of the board observation, a cell is 1 in a channel when it holds:
+# BODY: a part of the snake, the head included
+# HEAD: the head of the snake
+# FOOD: the food
+BODY = 0
+HEAD = 1
+FOOD = 2
+CHANNELS = 3
+
+# Rewards of a step
+REWARD_EAT = 1.0
+REWARD_WIN = 1.0
+REWARD_DIE = -1.0
+
+# Pixels per cell of the frame observation
+FRAME_CELL_SIZE = 8
+
+
+class SnakeEnv:
+    # Actions are indices into engine.DIRECTIONS, the action that turns the
+    # snake back keeps its direction. An episode is truncated after max_ticks
+    # steps when it is set. With frame=True the game is also drawn with the
+    # sprites and the play area is given as an RGB array in the info.
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        seed: Optional[int] = None,
+        max_ticks: Optional[int] = None,
+        frame: bool = False,
+        frame_cell_size: int = FRAME_CELL_SIZE,
+    ):
+        self.width = width
+        self.height = height
+        self.max_ticks = max_ticks
+        self.action_count = len(engine.DIRECTIONS)
+
+        # The channels cover the board with its wall border so a board cell is
+        # also the index of the cell in a channel, the observation is the view
+        # of the play area. The head can be written in the border when it hits
+        # a wall, where it is not seen.
+        stride = width + 2
+        self.cells = np.zeros((CHANNELS, stride * (height + 2)), dtype=np.uint8)
+        self.observation = self.cells.reshape(CHANNELS, height + 2, stride)[
+            :, 1:-1, 1:-1
+        ]
+
+        self.frame: Optional[np.ndarray] = None
+        if frame:
+            self.game = self.create_frame_game(seed, frame_cell_size)
+        else:
+            self.game = engine.Game(width, height, seed)
+        self.info = {"score": 0, "ticks": 0}
+        if frame:
+            self.info["frame"] = self.frame
+
+    # The game draws on a surface that shares its pixels with a NumPy array, so
+    # the frame is a view that is always up to date. pygame.surfarray views
+    # would lock the surface and the game could not draw on it while the frame
+    # is kept.
+    def create_frame_game(self, seed: Optional[int], cell_size: int) -> engine.Game:
+        import pygame as pg
+
+        import render
+
+        if not pg.get_init():
+            pg.init()
+        layout = render.Layout(self.width, self.height, cell_size)
+        self.pixels = np.zeros((layout.screen_height, layout.screen_width, 4), np.uint8)
+        surface = pg.image.frombuffer(
+            self.pixels, (layout.screen_width, layout.screen_height), "RGBX"
+        )
+        play_area = layout.play_area_rect()
+        self.frame = self.pixels[
+            play_area.top : play_area.bottom, play_area.left : play_area.right, :3
+        ]
+        return render.Game(self.width, self.height, render.View(surface, layout), seed)
+
+    def reset(self, seed: Optional[int] = None) -> tuple[np.ndarray, dict]:
+        game = self.game
+        game.start(seed)
+        cells = self.cells
+        cells.fill(0)
+        for cell in game.snake.body:
+            cells[BODY, cell] = 1
+        cells[HEAD, game.snake.body[-1]] = 1
+        self.write_food(1)
+        if self.frame is not None:
+            game.draw()
+        self.update_info()
+        return self.observation, self.info
+
+    def step(self, action: int) -> tuple[np.ndarray, float, bool, bool, dict]:
+        game = self.game
+        if game.state != engine.RUNNING:
+            raise RuntimeError("The episode is over, call reset() first")
+        cells = self.cells
+        body = game.snake.body
+        tail = body[0]
+        grows = game.snake.increase_in_next_tick
+        head = body[-1]
+        food = game.food.pos
+
+        # Like the keys of the game, an action cannot turn the snake back
+        direction = engine.DIRECTIONS[action]
+        x, y = game.get_snake_direction()
+        if direction != (-x, -y):
+            game.change_snake_direction(direction)
+        events = game.tick()
+
+        # The tail leaves its cell before the head enters, it may be the same cell
+        if not grows:
+            cells[BODY, tail] = 0
+        cells[HEAD, head] = 0
+        cells[BODY, body[-1]] = 1
+        cells[HEAD, body[-1]] = 1
+        if game.food.pos != food:
+            self.write_food(0, food)
+            self.write_food(1)
+
+        reward = 0.0
+        if engine.EAT in events:
+            reward = REWARD_EAT
+        elif engine.WIN in events:
+            reward = REWARD_WIN
+        elif engine.DIE in events:
+            reward = REWARD_DIE
+        terminated = game.state == engine.GAME_OVER
+        truncated = (
+            not terminated
+            and self.max_ticks is not None
+            and game.ticks >= self.max_ticks
+        )
+        if self.frame is not None:
+            game.draw()
+        self.update_info()
+        return self.observation, reward, terminated, truncated, self.info
+
+    # Write a value over the food, at its current position by default
+    def write_food(self, value: int, pos: Optional[engine.Cell] = None):
+        food = self.game.food
+        if pos is None:
+            pos = food.pos
+        if pos is None:
+            return
+        stride = self.game.board.stride
+        start = self.game.board.index(*pos)
+        for row in range(start, start + food.size * stride, stride):
+            self.cells[FOOD, row : row + food.size] = value
+
+    def update_info(self):
+        self.info["score"] = self.game.score()
+        self.info["ticks"] = self.game.ticks
@@ -0,0 +1,284 @@
+"""
+PySnake frame export
+Plays a game without a window and draws every tick with the game's own drawing
+code on an offscreen surface. The frames are saved as a sequence of PNG files
+or piped as raw RGB to a video encoder. Saving runs on a pool of threads fed
+through a bounded queue, the game only waits for them when they fall behind.
+
+    python export.py --size 20x20 --seed 42 --ticks 10000 --png frames
+    python export.py --replay replays.bin --pipe "ffmpeg -f rawvideo -pix_fmt rgb24 -s {width}x{height} -r 30 -i - clip.mp4"
+"""
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Optional
+
+import pygame as pg
+
+import engine
+import render
+from replay import Playback, load_replay
+from tournament import Settings, create_policy, parse_size
+
+# Frames drawn but not saved yet, the game waits when the queue is full
+QUEUE_SIZE = 64
+# Threads saving the PNG files
+PNG_WORKERS = 4
+
+
+# Save frames in the background. Frames are submitted as RGB bytes and written
+# by a pool of threads, at most queue_size of them wait to be written. An error
+# of a thread is raised by the next submit or by close.
+class FrameWriter(ABC):
+    def __init__(self, workers: int, queue_size: int = QUEUE_SIZE):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="frames")
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.error: Optional[BaseException] = None
+        self.frames = 0
+        # Seconds submit waited for a free slot in the queue
+        self.waited = 0.0
+
+    def submit(self, size: tuple[int, int], pixels: bytes):
+        if self.error is not None:
+            raise self.error
+        if not self.slots.acquire(blocking=False):
+            start = time.perf_counter()
+            self.slots.acquire()
+            self.waited += time.perf_counter() - start
+        future = self.executor.submit(self.write, self.frames, size, pixels)
+        future.add_done_callback(self.written)
+        self.frames += 1
+
+    def written(self, future: Future):
+        self.slots.release()
+        if future.exception() is not None and self.error is None:
+            self.error = future.exception()
+
+    @abstractmethod
+    def write(self, index: int, size: tuple[int, int], pixels: bytes):
+        pass
+
+    # Wait for every frame to be written
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self) -> "FrameWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Frame i is saved as directory/frame-i.png, the files are encoded in parallel
+class PngSequence(FrameWriter):
+    def __init__(
+        self,
+        directory: str,
+        pattern: str = "frame-{:06d}.png",
+        workers: int = PNG_WORKERS,
+        queue_size: int = QUEUE_SIZE,
+    ):
+        super(PngSequence, self).__init__(workers, queue_size)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.pattern = pattern
+
+    def write(self, index: int, size: tuple[int, int], pixels: bytes):
+        surface = pg.image.frombuffer(pixels, size, "RGB")
+        pg.image.save(surface, os.path.join(self.directory, self.pattern.format(index)))
+
+
+# The frames are written one after the other to a binary stream, a single
+# thread keeps them in order
+class RawVideo(FrameWriter):
+    def __init__(self, stream: BinaryIO, queue_size: int = QUEUE_SIZE):
+        super(RawVideo, self).__init__(1, queue_size)
+        self.stream = stream
+
+    def write(self, index: int, size: tuple[int, int], pixels: bytes):
+        self.stream.write(pixels)
+
+    def close(self):
+        super(RawVideo, self).close()
+        self.stream.flush()
+
+
+# The frames are piped to the standard input of an encoder, e.g. ffmpeg with
+# -f rawvideo -pix_fmt rgb24 -s WIDTHxHEIGHT -i -
+class EncoderPipe(RawVideo):
+    def __init__(self, command: list[str], queue_size: int = QUEUE_SIZE):
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        super(EncoderPipe, self).__init__(self.process.stdin, queue_size)
+
+    def close(self):
+        try:
+            super(EncoderPipe, self).close()
+        finally:
+            self.process.stdin.close()
+            code = self.process.wait()
+        if code != 0:
+            raise RuntimeError(f"The encoder exited with the code {code}")
+
+
+# A game drawn on an offscreen surface of the size of the game window
+def create_game(
+    width: int,
+    height: int,
+    seed: Optional[int] = None,
+    cell_size: int = render.CELL_SIZE,
+) -> render.Game:
+    layout = render.Layout(width, height, cell_size)
+    surface = pg.Surface((layout.screen_width, layout.screen_height))
+    if pg.display.get_surface() is not None:
+        surface = surface.convert()
+    return render.Game(width, height, render.View(surface, layout), seed)
+
+
+# Start the game and draw a frame for the start of the game and for every tick,
+# step plays one tick. Returns the number of ticks played.
+def export_game(
+    game: render.Game,
+    step: Callable[[], object],
+    writer: FrameWriter,
+    max_ticks: int,
+    seed: Optional[int] = None,
+) -> int:
+    surface = game.view.surface
+    size = surface.get_size()
+    game.start(seed)
+    game.draw()
+    writer.submit(size, pg.image.tobytes(surface, "RGB"))
+    while game.state == engine.RUNNING and game.ticks < max_ticks:
+        step()
+        game.draw()
+        writer.submit(size, pg.image.tobytes(surface, "RGB"))
+    return game.ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PySnake frame export")
+    parser.add_argument(
+        "--size", type=parse_size, default=(20, 20), metavar="WxH", help="board size"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed of the game")
+    parser.add_argument(
+        "--ticks", type=int, default=10_000, help="ticks after which the export stops"
+    )
+    parser.add_argument(
+        "--policy",
+        choices=("random", "scripted", "autopilot"),
+        default="autopilot",
+        help="how the snake is steered",
+    )
+    parser.add_argument(
+        "--script", default="", help="letters U, D, L, R or . played one per tick"
+    )
+    parser.add_argument(
+        "--replay", metavar="ARCHIVE", help="export a recorded game instead"
+    )
+    parser.add_argument(
+        "--index",
+        type=int,
+        default=-1,
+        help="index of the game to export in the archive, negative counts from the end",
+    )
+    parser.add_argument(
+        "--cell-size", type=int, default=render.CELL_SIZE, help="pixels per cell"
+    )
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument(
+        "--png", metavar="DIRECTORY", help="save the frames as PNG files"
+    )
+    output.add_argument(
+        "--raw", metavar="FILE", help="write the frames as raw RGB, - for stdout"
+    )
+    output.add_argument(
+        "--pipe",
+        metavar="COMMAND",
+        help="pipe the frames as raw RGB to an encoder, {width} and {height} are replaced",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=PNG_WORKERS, help="threads saving PNG files"
+    )
+    parser.add_argument(
+        "--queue-size", type=int, default=QUEUE_SIZE, help="frames waiting to be saved"
+    )
+    args = parser.parse_args()
+
+    replay = load_replay(args.replay, args.index) if args.replay else None
+    width, height = (replay.width, replay.height) if replay is not None else args.size
+
+    # No window is opened, the display only lets the sprites be converted to a
+    # format that is faster to draw
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pg.init()
+    pg.display.set_mode((1, 1))
+    game = create_game(width, height, cell_size=args.cell_size)
+    frame_width, frame_height = game.view.surface.get_size()
+
+    if replay is not None:
+        playback = Playback(replay, game)
+        step = playback.tick
+        seed = replay.seed
+        # A game recorded when the player quit stops where it was interrupted
+        max_ticks = min(args.ticks, replay.ticks)
+    else:
+        settings = Settings(
+            width, height, args.seed, args.ticks, args.policy, args.script
+        )
+        policy = create_policy(settings, game, args.seed)
+
+        def step():
+            policy.steer()
+            game.tick()
+
+        seed = args.seed
+        max_ticks = args.ticks
+
+    if args.png:
+        writer = PngSequence(args.png, workers=args.workers, queue_size=args.queue_size)
+    elif args.raw:
+        stream = sys.stdout.buffer if args.raw == "-" else open(args.raw, "wb")
+        writer = RawVideo(stream, args.queue_size)
+    else:
+        command = args.pipe.format(width=frame_width, height=frame_height)
+        writer = EncoderPipe(shlex.split(command), args.queue_size)
+
+    start = time.perf_counter()
+    try:
+        with writer:
+            ticks = export_game(game, step, writer, max_ticks, seed)
+    finally:
+        if args.raw and args.raw != "-":
+            writer.stream.close()
+    elapsed = time.perf_counter() - start
+    pg.quit()
+
+    json.dump(
+        {
+            "frames": writer.frames,
+            "ticks": ticks,
+            "score": game.score(),
+            "frame_size": [frame_width, frame_height],
+            "seconds": elapsed,
+            "frames_per_second": writer.frames / elapsed if elapsed > 0 else 0.0,
+            "queue_wait_seconds": writer.waited,
+        },
+        sys.stderr,
+        indent=2,
+    )
+    print(file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
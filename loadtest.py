@@ -0,0 +1,261 @@
+"""
+PySnake multiplayer load test
+Connects hundreds of headless players to a server, they turn at random and
+keep away from the walls. Every player measures the delay between a tick being
+sent and being read, and a few observers keep a copy of the whole arena from
+the changes they get to check that they are consistent. Some observers leave and
+join again during the test, to check the arena a player gets when it joins
+right after another one left.
+
+    python loadtest.py --players 300 --duration 30
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from collections import deque
+from random import Random
+
+import engine
+import protocol
+from arena import DIE, FOOD, HEAD, SPAWN, TAIL
+
+
+class Results:
+    def __init__(self):
+        self.players = 0
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.received_bytes = 0
+        self.latencies: list[float] = []
+        self.errors: list[str] = []
+
+    def to_dict(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+        return {
+            "players": self.players,
+            "ticks": self.ticks,
+            "missed_ticks": self.missed_ticks,
+            "ticks_per_second": self.ticks / elapsed if elapsed > 0 else 0.0,
+            "received_bytes_per_second": (
+                self.received_bytes / elapsed if elapsed > 0 else 0.0
+            ),
+            "latency_p50_ms": percentile(0.5) * 1000,
+            "latency_p99_ms": percentile(0.99) * 1000,
+            "latency_max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+            "errors": self.errors[:10],
+        }
+
+
+# The arena as seen by a player, rebuilt from the welcome and the changes of
+# every tick. Only the observers keep it, the other players only follow their
+# own snake.
+class Mirror:
+    def __init__(self, width: int, height: int, snakes, foods: list[int]):
+        self.board = engine.Board(width, height)
+        self.snakes: dict[int, deque[int]] = {}
+        for player, _, cells in snakes:
+            self.snakes[player] = deque(cells)
+            for cell in cells:
+                self.board.fill(cell, engine.SNAKE)
+        self.foods = foods
+
+    # Apply a change and return what is wrong with it, if anything
+    def apply(self, kind: int, owner: int, cell: int) -> str:
+        board = self.board
+        if kind == HEAD or kind == SPAWN:
+            if board.cells[cell] != engine.EMPTY:
+                return f"snake {owner} entered the filled cell {cell}"
+            board.fill(cell, engine.SNAKE)
+            if kind == SPAWN:
+                self.snakes[owner] = deque()
+            self.snakes[owner].append(cell)
+        elif kind == TAIL:
+            board.clear(self.snakes[owner].popleft())
+        elif kind == DIE:
+            for body_cell in self.snakes.pop(owner):
+                board.clear(body_cell)
+        elif kind == FOOD:
+            self.foods[owner] = cell
+        return ""
+
+
+async def play(
+    host: str,
+    port: int,
+    deadline: float,
+    turn_chance: float,
+    seed: int,
+    observe: bool,
+    results: Results,
+):
+    rng = Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        message = await protocol.read_message(reader)
+        player, width, height, tick, skipped, snakes, foods = protocol.decode_welcome(
+            message
+        )
+        results.players += 1
+        mirror = Mirror(width, height, snakes, foods) if observe else None
+        stride = width + 2
+        head = -1
+        direction = engine.RIGHT
+
+        while time.time() < deadline:
+            message = await protocol.read_message(reader)
+            now = time.time()
+            next_tick, sent, events = protocol.decode_tick(message)
+            results.ticks += 1
+            results.missed_ticks += next_tick - tick - 1
+            results.received_bytes += protocol.FRAME.size + len(message)
+            results.latencies.append(now - sent)
+            tick = next_tick
+            # The first changes of the first tick are already in the welcome
+            if skipped:
+                events = itertools.islice(events, skipped, None)
+                skipped = 0
+
+            for kind, owner, cell in events:
+                if mirror is not None:
+                    error = mirror.apply(kind, owner, cell)
+                    if error:
+                        results.errors.append(f"tick {tick}: {error}")
+                if owner != player:
+                    continue
+                if kind == HEAD:
+                    head = cell
+                elif kind == SPAWN:
+                    head = cell
+                    direction = engine.RIGHT
+                elif kind == DIE:
+                    head = -1
+            if head < 0:
+                continue
+
+            # Turn at random, and always before running into a wall
+            y, x = divmod(head, stride)
+            x -= 1
+            y -= 1
+            ahead = (x + direction[0], y + direction[1])
+            blocked = not engine.check_collision(ahead, (0, 0), (width, height))
+            if blocked or rng.random() < turn_chance:
+                turns = [
+                    d
+                    for d in engine.DIRECTIONS
+                    if d != direction
+                    and d != (-direction[0], -direction[1])
+                    and engine.check_collision(
+                        (x + d[0], y + d[1]), (0, 0), (width, height)
+                    )
+                ]
+                if turns:
+                    direction = rng.choice(turns)
+                    writer.write(protocol.frame(protocol.encode_input(direction)))
+    except (asyncio.IncompleteReadError, ConnectionError) as error:
+        results.errors.append(f"player disconnected: {error!r}")
+    finally:
+        writer.close()
+
+
+# An observer that leaves after a few seconds and joins again right away, over
+# and over until the end of the test
+async def rejoin(
+    host: str,
+    port: int,
+    deadline: float,
+    turn_chance: float,
+    seed: int,
+    results: Results,
+):
+    rng = Random(seed)
+    while time.time() < deadline:
+        leave = min(deadline, time.time() + rng.uniform(0.5, 3.0))
+        await play(host, port, leave, turn_chance, rng.getrandbits(32), True, results)
+
+
+async def run(args: argparse.Namespace) -> Results:
+    results = Results()
+    deadline = time.time() + args.duration
+    players = []
+    for index in range(args.players):
+        players.append(
+            asyncio.create_task(
+                play(
+                    args.host,
+                    args.port,
+                    deadline,
+                    args.turn_chance,
+                    args.seed + index,
+                    index < args.observers,
+                    results,
+                )
+            )
+        )
+        # Do not open every connection at once, the listen backlog is limited
+        if index % 50 == 49:
+            await asyncio.sleep(0.05)
+    for index in range(args.rejoiners):
+        players.append(
+            asyncio.create_task(
+                rejoin(
+                    args.host,
+                    args.port,
+                    deadline,
+                    args.turn_chance,
+                    args.seed + args.players + index,
+                    results,
+                )
+            )
+        )
+    for outcome in await asyncio.gather(*players, return_exceptions=True):
+        if isinstance(outcome, Exception):
+            results.errors.append(repr(outcome))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PySnake multiplayer load test")
+    parser.add_argument("--host", default="127.0.0.1", help="address of the server")
+    parser.add_argument("--port", type=int, default=7777, help="port of the server")
+    parser.add_argument("--players", type=int, default=200, help="number of players")
+    parser.add_argument(
+        "--duration", type=float, default=30, help="seconds the players play"
+    )
+    parser.add_argument(
+        "--turn-chance", type=float, default=0.1, help="chance to turn on a tick"
+    )
+    parser.add_argument(
+        "--observers",
+        type=int,
+        default=1,
+        help="players that check every change of the arena",
+    )
+    parser.add_argument(
+        "--rejoiners",
+        type=int,
+        default=2,
+        help="observers that keep leaving and joining again",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first player")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = asyncio.run(run(args))
+    json.dump(results.to_dict(time.perf_counter() - start), sys.stdout, indent=2)
+    print()
+    if results.errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,611 +4,383 @@ Author: sxntrxn (tranxuanson2013@gmail.com)
 """
 
 import pygame as pg
-from pygame.math import Vector2
 
-from abc import ABC, abstractmethod
-from random import randint
-from typing import Tuple
-
-# Configuration screen
-CELL_SIZE = 32
-TOP_OFFSET = CELL_SIZE * 5
-HORIZONTAL_OFFSET = CELL_SIZE
-BOT_OFFSET = CELL_SIZE * 2
-
-# Text shadow offset
-TEXT_SHADOW_OFFSET = 4
+import argparse
+import math
+
+import engine
+from autopilot import Autopilot
+from profiler import Profiler, ProfilerOverlay
+from render import CELL_SIZE, Food, Game, Layout, Snake, View, fit_cell_size
+from replay import Playback, Recorder, default_replay_path, load_replay, save_replay
+from scheduler import FixedTimestep
+from engine import UP, DOWN, LEFT, RIGHT
+
+# Command line options
+parser = argparse.ArgumentParser(description="PySnake")
+parser.add_argument(
+    "--replay", metavar="ARCHIVE", help="watch a recorded game instead of playing"
+)
+parser.add_argument(
+    "--index",
+    type=int,
+    default=-1,
+    help="index of the game to watch in the archive, negative counts from the end",
+)
+parser.add_argument(
+    "--speed", type=float, default=1, help="speed multiplier of the replay"
+)
+parser.add_argument(
+    "--record",
+    metavar="ARCHIVE",
+    default=default_replay_path(),
+    help="archive the played games are appended to",
+)
+parser.add_argument(
+    "--no-record", action="store_true", help="do not record the played games"
+)
+parser.add_argument(
+    "--autopilot",
+    action="store_true",
+    help="let the snake play on its own, A toggles it",
+)
+parser.add_argument(
+    "--level",
+    metavar="FILE",
+    help="play on a level with walls, see resources/levels, the games are not recorded",
+)
+parser.add_argument(
+    "--feast",
+    action="store_true",
+    help="play with many foods of several sizes and a bonus food that expires, "
+    "the games are not recorded",
+)
+parser.add_argument(
+    "--trace",
+    metavar="FILE",
+    help="record a Chrome trace of the frames from the start, F4 toggles it in game",
+)
+parser.add_argument(
+    "--view",
+    type=lambda size: tuple(int(count) for count in size.split("x")),
+    metavar="WxH",
+    help="number of visible cells, the view follows the snake on bigger boards",
+)
+args = parser.parse_args()
+REPLAY = load_replay(args.replay, args.index) if args.replay else None
+LEVEL = engine.load_level(args.level) if args.level and REPLAY is None else None
+# A replay does not know about the other foods or the level, such games are not
+# recorded
+RECORD = not (args.no_record or args.feast or LEVEL is not None)
 
 # User's Input
 CELL_HORIZONTAL_COUNTONTAL_COUNT = 0
 CELL_VERTICAL_COUNT = 0
-
-while CELL_HORIZONTAL_COUNTONTAL_COUNT <= 3:
+if REPLAY is not None:
+    CELL_HORIZONTAL_COUNTONTAL_COUNT = REPLAY.width
+    CELL_VERTICAL_COUNT = REPLAY.height
+if LEVEL is not None:
+    CELL_HORIZONTAL_COUNTONTAL_COUNT = LEVEL.width
+    CELL_VERTICAL_COUNT = LEVEL.height
+
+while CELL_HORIZONTAL_COUNTONTAL_COUNT < engine.MIN_BOARD_SIZE:
     CELL_HORIZONTAL_COUNTONTAL_COUNT = int(
         input("Enter the horizontal count of cells: ")
     )
-    if CELL_HORIZONTAL_COUNTONTAL_COUNT <= 3:
+    if CELL_HORIZONTAL_COUNTONTAL_COUNT < engine.MIN_BOARD_SIZE:
         print("Invalid input. Please enter a number greater than 3.")
 
-while CELL_VERTICAL_COUNT <= 3:
+while CELL_VERTICAL_COUNT < engine.MIN_BOARD_SIZE:
     CELL_VERTICAL_COUNT = int(input("Enter the vertical count of cells: "))
-    if CELL_VERTICAL_COUNT <= 3:
+    if CELL_VERTICAL_COUNT < engine.MIN_BOARD_SIZE:
         print("Invalid input. Please enter a number greater than 3.")
 
-# Calculate the width and height of the screen
-PLAY_AREA_WIDTH = CELL_HORIZONTAL_COUNTONTAL_COUNT * CELL_SIZE
-PLAY_AREA_HEIGHT = CELL_VERTICAL_COUNT * CELL_SIZE
-WIDTH = PLAY_AREA_WIDTH + 2 * HORIZONTAL_OFFSET
-HEIGHT = PLAY_AREA_HEIGHT + TOP_OFFSET + BOT_OFFSET
-
-# Direction constants
-UP = Vector2(0, -1)
-DOWN = Vector2(0, 1)
-LEFT = Vector2(-1, 0)
-RIGHT = Vector2(1, 0)
-
 # Initialize the pg engine
 pg.init()
 pg.mixer.init()
 
-
-# Loading resources
-def load_resources(path: str) -> pg.Surface:
-    return pg.transform.scale(pg.image.load(path), (CELL_SIZE, CELL_SIZE))
-
+# Calculate the width and height of the screen, a board that does not fit on the
+# desktop is shown through a view that follows the snake
+if args.view is not None:
+    VIEW_WIDTH, VIEW_HEIGHT = args.view
+else:
+    DESKTOP_WIDTH, DESKTOP_HEIGHT = pg.display.get_desktop_sizes()[0]
+    VIEW_WIDTH = (DESKTOP_WIDTH * 9 // 10) // CELL_SIZE - 2
+    VIEW_HEIGHT = (DESKTOP_HEIGHT * 9 // 10) // CELL_SIZE - 7
+LAYOUT = Layout(
+    CELL_HORIZONTAL_COUNTONTAL_COUNT,
+    CELL_VERTICAL_COUNT,
+    CELL_SIZE,
+    max(VIEW_WIDTH, engine.MIN_BOARD_SIZE),
+    max(VIEW_HEIGHT, engine.MIN_BOARD_SIZE),
+)
+
+
+# Set up the drawing window, the sprites are converted to its pixel format
+screen = pg.display.set_mode(
+    size=[LAYOUT.screen_width, LAYOUT.screen_height], flags=pg.RESIZABLE
+)
+pg.display.set_caption("PySnake")
 
 # Load sprites
 EAT_SFX = pg.mixer.Sound("resources/sounds/eat.ogg")
-ICON = load_resources("resources/icon.png")
-SNAKE = {
-    # Head
-    "HEAD_UP": load_resources("resources/sprites/snake/head_up.png"),
-    "HEAD_DOWN": load_resources("resources/sprites/snake/head_down.png"),
-    "HEAD_LEFT": load_resources("resources/sprites/snake/head_left.png"),
-    "HEAD_RIGHT": load_resources("resources/sprites/snake/head_right.png"),
-    # Body
-    "BODY_HORIZONTAL": load_resources("resources/sprites/snake/body_horizontal.png"),
-    "BODY_VERTICAL": load_resources("resources/sprites/snake/body_vertical.png"),
-    "BODY_TOP_LEFT": load_resources("resources/sprites/snake/body_tl.png"),
-    "BODY_TOP_RIGHT": load_resources("resources/sprites/snake/body_tr.png"),
-    "BODY_BOTTOM_LEFT": load_resources("resources/sprites/snake/body_bl.png"),
-    "BODY_BOTTOM_RIGHT": load_resources("resources/sprites/snake/body_br.png"),
-    # Tail
-    "TAIL_UP": load_resources("resources/sprites/snake/tail_up.png"),
-    "TAIL_DOWN": load_resources("resources/sprites/snake/tail_down.png"),
-    "TAIL_LEFT": load_resources("resources/sprites/snake/tail_left.png"),
-    "TAIL_RIGHT": load_resources("resources/sprites/snake/tail_right.png"),
-}
-FOOD_SPRITE = load_resources("resources/sprites/food.png")
-FENCE_SPRITE = {
-    "VERTICAL_MID": load_resources("resources/sprites/fences/fence_vertical_mid.png"),
-    "HORIZONTAL_MID": load_resources(
-        "resources/sprites/fences/fence_horizontal_mid.png"
-    ),
-    "TOP_LEFT": load_resources("resources/sprites/fences/fence_top_left.png"),
-    "TOP_RIGHT": load_resources("resources/sprites/fences/fence_top_right.png"),
-    "BOT_LEFT": load_resources("resources/sprites/fences/fence_bot_left.png"),
-    "BOT_RIGHT": load_resources("resources/sprites/fences/fence_bot_right.png"),
-}
-
-# Snake's direction mapping
-SNAKE_HEAD = {
-    tuple(UP): SNAKE["HEAD_UP"],
-    tuple(DOWN): SNAKE["HEAD_DOWN"],
-    tuple(LEFT): SNAKE["HEAD_LEFT"],
-    tuple(RIGHT): SNAKE["HEAD_RIGHT"],
-}
-
-SNAKE_TAIL = {
-    tuple(UP): SNAKE["TAIL_UP"],
-    tuple(DOWN): SNAKE["TAIL_DOWN"],
-    tuple(LEFT): SNAKE["TAIL_LEFT"],
-    tuple(RIGHT): SNAKE["TAIL_RIGHT"],
-}
-
-SNAKE_BODY = {
-    # Going in the straight line
-    tuple((tuple(UP), tuple(UP))): SNAKE["BODY_VERTICAL"],
-    tuple((tuple(DOWN), tuple(DOWN))): SNAKE["BODY_VERTICAL"],
-    tuple((tuple(LEFT), tuple(LEFT))): SNAKE["BODY_HORIZONTAL"],
-    tuple((tuple(RIGHT), tuple(RIGHT))): SNAKE["BODY_HORIZONTAL"],
-    # Curve
-    tuple((tuple(UP), tuple(LEFT))): SNAKE["BODY_TOP_RIGHT"],
-    tuple((tuple(UP), tuple(RIGHT))): SNAKE["BODY_TOP_LEFT"],
-    tuple((tuple(DOWN), tuple(LEFT))): SNAKE["BODY_BOTTOM_RIGHT"],
-    tuple((tuple(DOWN), tuple(RIGHT))): SNAKE["BODY_BOTTOM_LEFT"],
-    tuple((tuple(LEFT), tuple(UP))): SNAKE["BODY_BOTTOM_LEFT"],
-    tuple((tuple(LEFT), tuple(DOWN))): SNAKE["BODY_TOP_LEFT"],
-    tuple((tuple(RIGHT), tuple(UP))): SNAKE["BODY_BOTTOM_RIGHT"],
-    tuple((tuple(RIGHT), tuple(DOWN))): SNAKE["BODY_TOP_RIGHT"],
-}
-
-
-# Search snake mapping
-def search_snake_mapping(
-    d: dict[tuple, pg.Surface], *directions: Vector2
-) -> pg.Surface:
-    if len(directions) == 1:
-        direction = tuple(directions[0])
-        if direction in d:
-            return d[direction]
-        raise Exception(f"Direction {direction} not found in the mapping")
-    else:
-        direction = tuple(list(tuple(_direction) for _direction in directions))
-        if direction in d:
-            return d[direction]
-        raise Exception(f"Direction {direction} not found in the mapping")
-
-
-# Set up the drawing window
-screen = pg.display.set_mode(size=[WIDTH, HEIGHT])
-pg.display.set_caption("PySnake")
-pg.display.set_icon(ICON)
+view = View(screen, LAYOUT)
+pg.display.set_icon(view.sprites.icon)
 
 # Set up clock
 clock = pg.time.Clock()
 
 
-def calculate_position(x: int, y: int) -> Tuple[int, int]:
-    return x * CELL_SIZE + HORIZONTAL_OFFSET, y * CELL_SIZE + TOP_OFFSET
+# Frame timings, F3 shows them over the game and F4 records a trace
+TRACE_PATH = args.trace or "pysnake-trace.json"
+profiler = Profiler()
+profiler.instrument(
+    Game,
+    "tick",
+    "draw",
+    "draw_all",
+    "draw_start_screen",
+    "draw_score",
+    "draw_pause_hint",
+    "draw_game_over",
+)
+profiler.instrument(Snake, "draw", "draw_cell")
+profiler.instrument(Food, "draw")
+profiler.set_tracing(args.trace is not None)
+overlay = ProfilerOverlay(profiler)
+
+# Set the tickrate of the game
+TICKRATE = 1
+# Tick rates that can be chosen in game with the - and = keys
+SPEED_TIERS = (1, 2, 4, 8, 15, 30, 60, 120)
+# Frame rate of the window
+FPS = 60
+# Milliseconds the loop sleeps at most while waiting for an event when the game
+# is not running, nothing is drawn until something happens
+IDLE_TIMEOUT = 1000
+# Foods on the board next to the main food with --feast, they cover about one
+# cell in 30
+FEAST_FOODS = (
+    engine.FoodKind(CELL_HORIZONTAL_COUNTONTAL_COUNT * CELL_VERTICAL_COUNT // 40),
+    engine.FoodKind(
+        CELL_HORIZONTAL_COUNTONTAL_COUNT * CELL_VERTICAL_COUNT // 400, size=2
+    ),
+    engine.BONUS_FOOD,
+)
+scheduler = FixedTimestep(TICKRATE, frame_budget=1 / FPS)
+game = Game(
+    CELL_HORIZONTAL_COUNTONTAL_COUNT,
+    CELL_VERTICAL_COUNT,
+    view,
+    food_kinds=FEAST_FOODS if args.feast and REPLAY is None else (),
+    level=LEVEL,
+)
+
+# Either watch a replay or record the games that are played
+playback = None
+recorder = None
+if REPLAY is not None:
+    playback = Playback(REPLAY, game)
+    scheduler.tick_rate = TICKRATE * args.speed
+    tick = playback.tick
+else:
+    recorder = Recorder(
+        game,
+        on_finish=None if not RECORD else lambda r: save_replay(args.record, r),
+    )
+    tick = recorder.tick
+
+# The autopilot steers the snake before every tick while it is on
+autopilot = Autopilot(game)
+autopilot_on = args.autopilot and playback is None
+
 
+# Directions of the arrow keys
+KEY_DIRECTIONS = {pg.K_UP: UP, pg.K_DOWN: DOWN, pg.K_LEFT: LEFT, pg.K_RIGHT: RIGHT}
 
-# Check if the target is within the boundaries of the top_left and bottom_right
-def check_collision(target: Vector2, top_left: Vector2, bottom_right: Vector2) -> bool:
-    return (
-        top_left.x <= target.x < bottom_right.x
-        and top_left.y <= target.y < bottom_right.y
+
+# Input to move latencies of the turns, for the profiler overlay and the console
+def latency_report() -> str:
+    percentiles = game.turn_latency_percentiles()
+    if not percentiles:
+        return "input latency: no turns yet"
+    return "input latency " + "  ".join(
+        f"p{percentile} {latency * 1000:.1f} ms"
+        for percentile, latency in percentiles.items()
     )
 
 
-# Generate a random position for the food that is not colliding with the snake
-def generate_food_position(snake_body: list[Vector2], size: int) -> Vector2:
-    free_cells = []
-    for x in range(CELL_HORIZONTAL_COUNTONTAL_COUNT):
-        for y in range(CELL_VERTICAL_COUNT):
-            food_pos = Vector2(x, y)
-            if any(
-                check_collision(food_pos, body_part, body_part + Vector2(1, 1))
-                for body_part in snake_body
-            ):
-                continue
-            free_cells.append(food_pos)
-    if len(free_cells) == 0:
-        return None
-    return free_cells[randint(0, len(free_cells) - 1)]
-
-
-class GameObject(ABC):
-    @abstractmethod
-    def draw(self):
-        pass
-
-
-class Snake(GameObject):
-    body: list[Vector2] = [Vector2(0, 0), Vector2(1, 0), Vector2(2, 0)]
-    # The intended direction of the snake, this will be updated to the current direction every tick
-    direction = RIGHT
-    # The current direction of the snake
-    current_direction = RIGHT
-    # Flag to increase the length of the snake
-    increase_in_next_tick = False
-
-    def __init__(self):
-        super(Snake, self).__init__()
-
-    def draw(self):
-        # Draw the head
-        head = search_snake_mapping(SNAKE_HEAD, self.current_direction)
-        translated_pos = calculate_position(self.body[-1].x, self.body[-1].y)
-        head_rect = pg.rect.Rect(
-            translated_pos[0], translated_pos[1], CELL_SIZE, CELL_SIZE
-        )
-        screen.blit(head, head_rect)
-
-        # Draw the body
-        for body_index in range(1, len(self.body) - 1):
-            # Get the direction of the body part
-            first_body_part_direction = (
-                self.body[body_index] - self.body[body_index - 1]
-            )
-            second_body_part_direction = (
-                self.body[body_index + 1] - self.body[body_index]
-            )
-            # print(f"Body part direction: {body_part_direction}")
-            body = search_snake_mapping(
-                SNAKE_BODY, first_body_part_direction, second_body_part_direction
-            )
-
-            translated_pos = calculate_position(
-                self.body[body_index].x, self.body[body_index].y
-            )
-            body_rect = pg.rect.Rect(
-                translated_pos[0], translated_pos[1], CELL_SIZE, CELL_SIZE
-            )
-            screen.blit(body, body_rect)
-
-        # Draw the tail
-        tail_direction = self.body[1] - self.body[0]
-        tail = search_snake_mapping(SNAKE_TAIL, tail_direction)
-        translated_pos = calculate_position(self.body[0].x, self.body[0].y)
-        tail_rect = pg.rect.Rect(
-            translated_pos[0], translated_pos[1], CELL_SIZE, CELL_SIZE
-        )
-        screen.blit(tail, tail_rect)
-
-    def move(self):
-        # Update the current direction
-        self.current_direction = self.direction
-
-        # Increase the length of the snake if the flag is set and clear the flag
-        # Also do a circuit break to prevent the snake from going forward
-        if self.increase_in_next_tick:
-            self.increase_in_next_tick = False
-            new_head = self.body[-1] + self.current_direction
-            body_copy = self.body[:]
-            body_copy.append(new_head)
-            self.body = body_copy[:]
-            return
-
-        # Copy the body parts of the snake except the tail
-        body_copy = self.body[1:]
-        # Calculate the new head based on the current direction
-        new_head = self.body[-1] + self.current_direction
-        # Insert the new head at the last position
-        body_copy.append(new_head)
-        # Update the body
-        self.body = body_copy[:]
-
-
-class Food(GameObject):
-    # size of the food intended to make the food bigger (like the childhood Nokia snake game)
-    def __init__(self, snake_body: list[Vector2], size: int = 1):
-        super(Food, self).__init__()
-        self.pos = generate_food_position(snake_body, size)
-        self.size = size
-
-    def draw(self):
-        translated_pos = calculate_position(self.pos.x, self.pos.y)
-        food_rect = pg.rect.Rect(
-            translated_pos[0],
-            translated_pos[1],
-            CELL_SIZE * self.size,
-            CELL_SIZE * self.size,
-        )
-        screen.blit(FOOD_SPRITE, food_rect)
-
-    def update(self, pos: Vector2):
-        self.pos = pos
-
-
-class Game:
-    # The current state of the game
-    # NOT_YET_STARTED: The game has not started yet
-    # RUNNING: The game is running
-    # PAUSED: The game is paused
-    # GAME_OVER: The game is over
-    state = "NOT_YET_STARTED"
-
-    def __init__(self):
-        self.init()
-
-    def init(self):
-        self.snake = Snake()
-        self.food = Food(self.snake.body, 1)
-
-    def start(self):
-        self.init()
-        self.state = "RUNNING"
-
-    def tick(self):
-        if self.state != "RUNNING":
-            return
-
-        self.snake.move()
-
-        # Check if the snake cover the whole board
-        if (
-            len(self.snake.body)
-            == CELL_HORIZONTAL_COUNTONTAL_COUNT * CELL_VERTICAL_COUNT
-        ):
-            self.state = "GAME_OVER"
-            return
-
-        # Check if the snake has collided with itself
-        if any(
-            check_collision(self.snake.body[-1], body_part, body_part + Vector2(1, 1))
-            for body_part in self.snake.body[:-1]
-        ):
-            game.state = "GAME_OVER"
-            return
-
-        # Check if the snake has collided with the boundaries
-        if not check_collision(
-            self.snake.body[-1],
-            Vector2(0, 0),
-            Vector2(CELL_HORIZONTAL_COUNTONTAL_COUNT, CELL_VERTICAL_COUNT),
-        ):
-            game.state = "GAME_OVER"
-            return
-
-        # Check if the snake has collided with the food
-        if check_collision(
-            self.snake.body[-1],
-            self.food.pos,
-            self.food.pos + Vector2(self.food.size, self.food.size),
-        ):
-            EAT_SFX.play()
-            self.snake.increase_in_next_tick = True
-            next_food_pos = generate_food_position(self.snake.body, self.food.size + 1)
-            if next_food_pos is None:
-                self.state = "GAME_OVER"
-                return
-            self.food.update(next_food_pos)
-
-    def change_snake_direction(self, direction: Vector2):
-        self.snake.direction = direction
-
-    def get_snake_direction(self) -> Vector2:
-        return self.snake.current_direction
-
-    def draw(self):
-        screen.fill((65, 152, 10))
-
-        if self.state == "NOT_YET_STARTED":
-            self.draw_start_screen()
-            return
-
-        if self.state == "GAME_OVER":
-            self.draw_game_over()
-            return
-
-        self.draw_board()
-        self.draw_fence()
-        self.draw_score()
-
-        self.snake.draw()
-        self.food.draw()
-
-    def draw_start_screen(self):
-        game_name_font = pg.font.Font(None, 48)
-        # Draw the shadow of the text
-        game_name_text = game_name_font.render("Press SPACE to start", True, (0, 0, 0))
-        game_name_text_rect = game_name_text.get_rect(
-            center=(WIDTH // 2 + TEXT_SHADOW_OFFSET, HEIGHT // 2)
-        )
-        screen.blit(game_name_text, game_name_text_rect)
-        # Draw the actual text
-        game_name_text = game_name_font.render(
-            "Press SPACE to start", True, (255, 255, 255)
-        )
-        game_name_text_rect = game_name_text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-        screen.blit(game_name_text, game_name_text_rect)
-
-    def draw_board(self):
-        for x in range(CELL_HORIZONTAL_COUNTONTAL_COUNT):
-            for y in range(x % 2, CELL_VERTICAL_COUNT, 2):
-                cell_rect = pg.rect.Rect(
-                    x * CELL_SIZE + HORIZONTAL_OFFSET,
-                    y * CELL_SIZE + TOP_OFFSET,
-                    CELL_SIZE,
-                    CELL_SIZE,
-                )
-                pg.draw.rect(screen, (0, 100, 0), cell_rect)
-
-    def draw_fence(self):
-        # Draw the horizontal fence
-        screen.blit(
-            FENCE_SPRITE["TOP_LEFT"],
-            (HORIZONTAL_OFFSET - CELL_SIZE, TOP_OFFSET - CELL_SIZE),
-        )
-        screen.blit(
-            FENCE_SPRITE["BOT_LEFT"],
-            (HORIZONTAL_OFFSET - CELL_SIZE, HEIGHT - BOT_OFFSET),
-        )
-        for x in range(CELL_HORIZONTAL_COUNTONTAL_COUNT):
-            # Draw the top fence
-            screen.blit(
-                FENCE_SPRITE["HORIZONTAL_MID"],
-                (x * CELL_SIZE + HORIZONTAL_OFFSET, TOP_OFFSET - CELL_SIZE),
-            )
-            # Draw the bottom fence
-            screen.blit(
-                FENCE_SPRITE["HORIZONTAL_MID"],
-                (x * CELL_SIZE + HORIZONTAL_OFFSET, HEIGHT - BOT_OFFSET),
-            )
-        screen.blit(
-            FENCE_SPRITE["TOP_RIGHT"],
-            (
-                CELL_HORIZONTAL_COUNTONTAL_COUNT * CELL_SIZE + HORIZONTAL_OFFSET,
-                TOP_OFFSET - CELL_SIZE,
-            ),
-        )
-        screen.blit(
-            FENCE_SPRITE["BOT_RIGHT"],
-            (
-                CELL_HORIZONTAL_COUNTONTAL_COUNT * CELL_SIZE + HORIZONTAL_OFFSET,
-                HEIGHT - BOT_OFFSET,
-            ),
-        )
-
-        # Draw the vertical fences
-        for y in range(CELL_VERTICAL_COUNT):
-            screen.blit(
-                FENCE_SPRITE["VERTICAL_MID"],
-                (HORIZONTAL_OFFSET - CELL_SIZE, y * CELL_SIZE + TOP_OFFSET),
-            )
-            screen.blit(
-                FENCE_SPRITE["VERTICAL_MID"],
-                (
-                    CELL_HORIZONTAL_COUNTONTAL_COUNT * CELL_SIZE + HORIZONTAL_OFFSET,
-                    y * CELL_SIZE + TOP_OFFSET,
-                ),
-            )
-
-    def draw_score(self):
-        # Draw the score panel
-        score_panel_rect = pg.rect.Rect(
-            HORIZONTAL_OFFSET - (CELL_SIZE // 2),
-            CELL_SIZE // 2,
-            PLAY_AREA_WIDTH + CELL_SIZE,
-            TOP_OFFSET - 2 * CELL_SIZE,
-        )
-        pg.draw.rect(screen, (255, 255, 255), score_panel_rect, 2)
-
-        # Draw the game name and the author under
-        game_name_font = pg.font.Font(None, 48)
-        # Draw the shadow of the text
-        game_name_text = game_name_font.render("PySnake", True, (0, 0, 0))
-        game_name_text_rect = game_name_text.get_rect(
-            center=(WIDTH // 2 + TEXT_SHADOW_OFFSET, CELL_SIZE + CELL_SIZE // 2)
-        )
-        screen.blit(game_name_text, game_name_text_rect)
-        # Draw the actual text
-        game_name_text = game_name_font.render("PySnake", True, (255, 255, 255))
-        game_name_text_rect = game_name_text.get_rect(
-            center=(WIDTH // 2, CELL_SIZE + CELL_SIZE // 2)
-        )
-        screen.blit(game_name_text, game_name_text_rect)
-
-        # Draw the score text
-        score_font = pg.font.Font(None, 36)
-        score_text = score_font.render(
-            f"Score: {len(self.snake.body) - 3}", True, (255, 255, 255)
-        )
-        score_text_rect = score_text.get_rect(
-            center=(WIDTH // 2, TOP_OFFSET // 2 + CELL_SIZE // 2)
-        )
-        screen.blit(score_text, score_text_rect)
-
-        # Draw the instruction to pause the game
-        pause_font = pg.font.Font(None, 24)
-        pause_text = pause_font.render(
-            (
-                "Press SPACE to pause"
-                if self.state == "RUNNING"
-                else "Press SPACE to resume"
-            ),
-            True,
-            (255, 255, 255),
-        )
-        pause_text_rect = pause_text.get_rect(
-            center=(
-                WIDTH // 2,
-                TOP_OFFSET + PLAY_AREA_HEIGHT + CELL_SIZE + CELL_SIZE // 2,
-            )
-        )
-        screen.blit(pause_text, pause_text_rect)
-
-    def draw_game_over(self):
-        game_over_font = pg.font.Font(None, 48)
-        # Draw the shadow of the text
-        game_over_text = game_over_font.render("Game Over", True, (0, 0, 0))
-        game_over_text_rect = game_over_text.get_rect(
-            center=(WIDTH // 2 + TEXT_SHADOW_OFFSET, HEIGHT // 2 - 2 * CELL_SIZE)
-        )
-        screen.blit(game_over_text, game_over_text_rect)
-        # Draw the actual text
-        game_over_text = game_over_font.render("Game Over", True, (255, 255, 255))
-        game_over_text_rect = game_over_text.get_rect(
-            center=(WIDTH // 2, HEIGHT // 2 - 2 * CELL_SIZE)
-        )
-        screen.blit(game_over_text, game_over_text_rect)
-
-        # Draw the score text
-        score_font = pg.font.Font(None, 36)
-        score_text = score_font.render(
-            f"Score: {len(self.snake.body) - 3}", True, (255, 255, 255)
-        )
-        score_text_rect = score_text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-        screen.blit(score_text, score_text_rect)
-
-        # Draw the win or lose message
-        if (
-            len(self.snake.body)
-            == CELL_HORIZONTAL_COUNTONTAL_COUNT * CELL_VERTICAL_COUNT
-        ):
-            win_font = pg.font.Font(None, 36)
-            # Draw the shadow of the text
-            win_text = win_font.render("You Win!", True, (0, 0, 0))
-            win_text_rect = win_text.get_rect(
-                center=(WIDTH // 2 + TEXT_SHADOW_OFFSET, HEIGHT // 2 + 4 * CELL_SIZE)
-            )
-            screen.blit(win_text, win_text_rect)
-            # Draw the actual text
-            win_text = win_font.render("You Win!", True, (255, 255, 255))
-            win_text_rect = win_text.get_rect(
-                center=(WIDTH // 2, HEIGHT // 2 + 4 * CELL_SIZE)
-            )
-            screen.blit(win_text, win_text_rect)
-        else:
-            lose_font = pg.font.Font(None, 36)
-            # Draw the shadow of the text
-            lose_text = lose_font.render("You Lose!", True, (0, 0, 0))
-            lose_text_rect = lose_text.get_rect(
-                center=(WIDTH // 2 + TEXT_SHADOW_OFFSET, HEIGHT // 2 + 4 * CELL_SIZE)
-            )
-            screen.blit(lose_text, lose_text_rect)
-            # Draw the actual text
-            lose_text = lose_font.render("You Lose!", True, (255, 255, 255))
-            lose_text_rect = lose_text.get_rect(
-                center=(WIDTH // 2, HEIGHT // 2 + 4 * CELL_SIZE)
-            )
-            screen.blit(lose_text, lose_text_rect)
-
-        # Draw the instruction to restart the game
-        restart_font = pg.font.Font(None, 24)
-        # Draw the shadow of the text
-        restart_text = restart_font.render("Press SPACE to restart", True, (0, 0, 0))
-        restart_text_rect = restart_text.get_rect(
-            center=(WIDTH // 2 + TEXT_SHADOW_OFFSET, HEIGHT // 2 + 6 * CELL_SIZE)
-        )
-        screen.blit(restart_text, restart_text_rect)
-
-    def on_space_pressed(self):
-        if self.state == "GAME_OVER" or self.state == "NOT_YET_STARTED":
-            self.start()
-        else:
-            self.state = "PAUSED" if self.state == "RUNNING" else "RUNNING"
+# Where the game is drawn in the window, it is centered when the window is resized
+origin = (0, 0)
 
 
-# User events
-GAME_TICK = pg.USEREVENT
-# Set the tickrate of the game
-TICKRATE = 1
-pg.time.set_timer(GAME_TICK, 1000 // TICKRATE)
-game = Game()
+# Scale the game to the new size of the window, the sprites of the sizes that
+# were used before come from the cache of the view
+def resize(width: int, height: int):
+    global screen, origin
+    screen = pg.display.get_surface()
+    screen.fill((65, 152, 10))
+    layout = view.layout
+    cell_size = fit_cell_size(layout.view_width, layout.view_height, width, height)
+    layout = Layout(
+        layout.width, layout.height, cell_size, layout.view_width, layout.view_height
+    )
+    rect = pg.Rect(0, 0, layout.screen_width, layout.screen_height)
+    rect.center = screen.get_rect().center
+    # The game is cut when the window is smaller than the smallest cells
+    if screen.get_rect().contains(rect):
+        surface = screen.subsurface(rect)
+        origin = rect.topleft
+    else:
+        surface = screen
+        origin = (0, 0)
+    view.resize(surface, layout)
+    game.relayout()
+    overlay.under = None
+
+
+# Steer with the autopilot and play the sound of the food being eaten
+def tick_with_sound():
+    if autopilot_on:
+        with profiler.span("autopilot"):
+            autopilot.steer()
+    events = tick()
+    if engine.EAT in events:
+        with profiler.span("sound"):
+            EAT_SFX.play()
+    return events
+
+
+def change_speed_tier(step: int):
+    tier = 0
+    while tier < len(SPEED_TIERS) - 1 and SPEED_TIERS[tier] < scheduler.tick_rate:
+        tier += 1
+    tier = min(max(tier + step, 0), len(SPEED_TIERS) - 1)
+    scheduler.tick_rate = SPEED_TIERS[tier]
+
+
+# A replay that was interrupted stops before the end of its game
+def is_running() -> bool:
+    if playback is not None and playback.finished():
+        return False
+    return game.state == engine.RUNNING
+
+
+# Sleep until an event comes or the next tick is due. The loop only has to
+# run every frame while a fast-forwarded game is running or the timings are
+# shown.
+def wait_for_events() -> list[pg.event.Event]:
+    events = pg.event.get()
+    if events or profiler.overlay:
+        return events
+    if is_running():
+        if scheduler.unthrottled:
+            return events
+        timeout = math.ceil(scheduler.time_until_next_tick() * 1000)
+        if timeout <= 0:
+            return events
+    else:
+        timeout = IDLE_TIMEOUT
+    event = pg.event.wait(timeout)
+    if event.type == pg.NOEVENT:
+        return events
+    return [event] + pg.event.get()
+
 
 # Run until the user asks to quit
 running = True
+# Something changed on the screen since the last frame
+invalidated = True
+# The whole window has to be updated, it was covered or shown again
+exposed = True
 while running:
+    profiler.frame()
+
+    with profiler.span("wait"):
+        events = wait_for_events()
 
     # Handle events
-    for event in pg.event.get():
-        if event.type == pg.QUIT:
-            running = False
-        # Move thticke everytick
-        if event.type == GAME_TICK:
-            game.tick()
-        # Handle key press events
-        if event.type == pg.KEYDOWN:
-            if event.key == pg.K_UP and game.get_snake_direction().y == 0:
-                game.change_snake_direction(UP)
-            if event.key == pg.K_DOWN and game.get_snake_direction().y == 0:
-                game.change_snake_direction(DOWN)
-            if event.key == pg.K_LEFT and game.get_snake_direction().x == 0:
-                game.change_snake_direction(LEFT)
-            if event.key == pg.K_RIGHT and game.get_snake_direction().x == 0:
-                game.change_snake_direction(RIGHT)
-            if event.key == pg.K_SPACE:
-                game.on_space_pressed()
-
-    # Draw all game objects
-    game.draw()
-
-    # Update the screen
-    pg.display.update()
-    # Maintain a frame rate of 60 frames per second
-    clock.tick(60)
+    with profiler.span("events"):
+        # Only the last size matters when the window is dragged
+        resized_to = None
+        for event in events:
+            if event.type == pg.QUIT:
+                running = False
+            if event.type == pg.VIDEORESIZE:
+                resized_to = event.size
+            if event.type == pg.WINDOWEXPOSED or event.type == pg.VIDEOEXPOSE:
+                invalidated = exposed = True
+            # Handle key press events
+            if event.type == pg.KEYDOWN:
+                invalidated = True
+                # The snake of a replay only follows the recorded directions
+                # Quick turns are queued and taken one per tick
+                if playback is None and event.key in KEY_DIRECTIONS:
+                    game.queue_turn(KEY_DIRECTIONS[event.key])
+                if event.key == pg.K_SPACE:
+                    if playback is not None and playback.finished():
+                        playback.restart()
+                    else:
+                        game.on_space_pressed()
+                # Change the speed of the game, F fast-forwards as fast as possible
+                if event.key == pg.K_MINUS:
+                    change_speed_tier(-1)
+                if event.key == pg.K_EQUALS:
+                    change_speed_tier(1)
+                if event.key == pg.K_f:
+                    scheduler.unthrottled = not scheduler.unthrottled
+                    scheduler.reset()
+                if event.key == pg.K_a and playback is None:
+                    autopilot_on = not autopilot_on
+                # F3 shows the frame timings, F4 starts and stops recording a trace
+                if event.key == pg.K_F3:
+                    profiler.set_overlay(not profiler.overlay)
+                if event.key == pg.K_F4:
+                    if profiler.tracing:
+                        profiler.save_trace(TRACE_PATH)
+                    profiler.set_tracing(not profiler.tracing)
+        if resized_to is not None:
+            resize(*resized_to)
+            invalidated = exposed = True
+
+    # Move the snake for every tick that is due. The time the game is not
+    # running is not counted, so it does not resume with a burst of ticks.
+    with profiler.span("ticks"):
+        if is_running():
+            if scheduler.run(tick_with_sound) > 0:
+                invalidated = True
+        else:
+            scheduler.reset()
+
+    if not invalidated and not profiler.overlay:
+        continue
+
+    # Draw what changed since the last frame and update only those areas of the screen
+    rects = overlay.erase(screen)
+    rects += [rect.move(origin) for rect in game.draw()]
+    if profiler.overlay:
+        with profiler.span("overlay"):
+            rects += overlay.draw(screen, scheduler.accumulator, [latency_report()])
+    with profiler.span("display.update"):
+        if exposed:
+            pg.display.update()
+        else:
+            pg.display.update(rects)
+    invalidated = exposed = False
+    # Draw at most 60 frames per second
+    with profiler.span("clock.tick"):
+        clock.tick(FPS)
+
+# Keep the game that was interrupted
+if recorder is not None and RECORD and game.ticks > 0:
+    if game.state == engine.RUNNING or game.state == engine.PAUSED:
+        save_replay(args.record, recorder.replay())
+
+if profiler.tracing:
+    profiler.save_trace(TRACE_PATH)
+
+if game.turn_latencies:
+    print(latency_report())
 
 # Quit the game
 pg.quit()
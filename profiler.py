@@ -0,0 +1,234 @@
+"""
+PySnake profiler
+Times the phases of every frame (event handling, ticks, drawing, display
+update...) for an in-game overlay and for traces in the Chrome trace event
+format, which can be opened in chrome://tracing or https://ui.perfetto.dev.
+Nothing is measured while the profiler is disabled.
+"""
+
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Callable, Optional, Sequence
+
+import pygame as pg
+
+# Frame times of the histogram are grouped in bins of this many milliseconds,
+# the last bin gets every slower frame
+HISTOGRAM_BIN = 2
+HISTOGRAM_BINS = 20
+
+# Seconds between two refreshes of the overlay, rendering its texts every frame
+# would show up in the timings it displays
+OVERLAY_REFRESH = 0.25
+
+# The span used while the profiler is disabled
+NO_SPAN = nullcontext()
+
+
+class Span:
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = self.profiler.clock()
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.start, self.profiler.clock())
+
+
+class Profiler:
+    def __init__(
+        self,
+        history: int = 120,
+        max_events: int = 1_000_000,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.clock = clock
+        # Time of the phases in the current frame
+        self.phases: dict[str, float] = {}
+        # Phase times and duration of the last frames
+        self.frames: deque[dict[str, float]] = deque(maxlen=history)
+        self.frame_times: deque[float] = deque(maxlen=history)
+        self.frame_start: Optional[float] = None
+        # Trace events, the oldest ones are dropped past max_events
+        self.events: deque[dict] = deque(maxlen=max_events)
+        self.origin = clock()
+        # Methods timed as a phase while the profiler is enabled, by class
+        self.targets: list[tuple[type, str]] = []
+        self.originals: dict[tuple[type, str], Callable] = {}
+        self.overlay = False
+        self.tracing = False
+
+    def enabled(self) -> bool:
+        return self.overlay or self.tracing
+
+    def set_overlay(self, overlay: bool):
+        self.overlay = overlay
+        self.update_instrumentation()
+
+    def set_tracing(self, tracing: bool):
+        self.tracing = tracing
+        self.update_instrumentation()
+
+    # Time every call of these methods of a class as a phase named after the
+    # class and the method, the methods are only replaced while enabled
+    def instrument(self, cls: type, *names: str):
+        self.targets.extend((cls, name) for name in names)
+        self.update_instrumentation()
+
+    def update_instrumentation(self):
+        for cls, name in self.targets:
+            key = (cls, name)
+            if self.enabled() and key not in self.originals:
+                self.originals[key] = cls.__dict__[name]
+                setattr(cls, name, self.timed(f"{cls.__name__}.{name}", cls, name))
+            elif not self.enabled() and key in self.originals:
+                setattr(cls, name, self.originals.pop(key))
+
+    def timed(self, span_name: str, cls: type, name: str) -> Callable:
+        method = cls.__dict__[name]
+        clock = self.clock
+        record = self.record
+
+        def timed_method(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record(span_name, start, clock())
+
+        timed_method.__name__ = name
+        timed_method.__qualname__ = method.__qualname__
+        return timed_method
+
+    # Time the code of a with block as a phase
+    def span(self, name: str):
+        if not self.enabled():
+            return NO_SPAN
+        return Span(self, name)
+
+    def record(self, name: str, start: float, end: float):
+        self.phases[name] = self.phases.get(name, 0.0) + end - start
+        if self.tracing:
+            self.trace(name, start, end)
+
+    def trace(self, name: str, start: float, end: float):
+        self.events.append(
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": 0,
+                "tid": 0,
+            }
+        )
+
+    # Close the current frame and start the next one, called once per frame
+    def frame(self):
+        now = self.clock()
+        if self.enabled() and self.frame_start is not None:
+            self.frame_times.append(now - self.frame_start)
+            self.frames.append(self.phases)
+            if self.tracing:
+                self.trace("frame", self.frame_start, now)
+        self.phases = {}
+        self.frame_start = now if self.enabled() else None
+
+    # Average time of every phase over the last frames, in seconds
+    def averages(self) -> dict[str, float]:
+        totals: dict[str, float] = {}
+        for phases in self.frames:
+            for name, duration in phases.items():
+                totals[name] = totals.get(name, 0.0) + duration
+        count = max(len(self.frames), 1)
+        return {name: total / count for name, total in totals.items()}
+
+    def fps(self) -> float:
+        total = sum(self.frame_times)
+        return len(self.frame_times) / total if total > 0 else 0.0
+
+    def histogram(self) -> list[int]:
+        bins = [0] * HISTOGRAM_BINS
+        for frame_time in self.frame_times:
+            index = int(frame_time * 1000 // HISTOGRAM_BIN)
+            bins[min(index, HISTOGRAM_BINS - 1)] += 1
+        return bins
+
+    def save_trace(self, path: str):
+        with open(path, "w") as trace:
+            json.dump(
+                {"traceEvents": list(self.events), "displayTimeUnit": "ms"}, trace
+            )
+
+
+# Draws the timings of a profiler in a corner of the screen. What is under the
+# overlay is kept and put back before the next frame is drawn, so the game can
+# keep drawing only what changed.
+class ProfilerOverlay:
+    def __init__(self, profiler: Profiler, position: tuple[int, int] = (4, 4)):
+        self.profiler = profiler
+        self.position = position
+        self.font: Optional[pg.font.Font] = None
+        self.panel: Optional[pg.Surface] = None
+        self.refreshed = 0.0
+        self.under: Optional[pg.Surface] = None
+        self.rect = pg.Rect(position, (0, 0))
+
+    # Put back what was under the overlay and return the area to update
+    def erase(self, surface: pg.Surface) -> list[pg.Rect]:
+        if self.under is None:
+            return []
+        surface.blit(self.under, self.rect)
+        self.under = None
+        return [self.rect]
+
+    # Draw the overlay and return the area to update, the notes are shown
+    # under the frame rate
+    def draw(
+        self, surface: pg.Surface, tick_lag: float = 0.0, notes: Sequence[str] = ()
+    ) -> list[pg.Rect]:
+        now = self.profiler.clock()
+        if self.panel is None or now - self.refreshed >= OVERLAY_REFRESH:
+            self.panel = self.render(tick_lag, notes)
+            self.refreshed = now
+        self.rect = self.panel.get_rect(topleft=self.position).clip(surface.get_rect())
+        self.under = surface.subsurface(self.rect).copy()
+        surface.blit(self.panel, self.rect)
+        return [self.rect]
+
+    def render(self, tick_lag: float, notes: Sequence[str] = ()) -> pg.Surface:
+        if self.font is None:
+            self.font = pg.font.Font(None, 18)
+        profiler = self.profiler
+        lines = [f"FPS {profiler.fps():.1f}  tick lag {tick_lag * 1000:.1f} ms"]
+        lines.extend(notes)
+        for name, duration in profiler.averages().items():
+            lines.append(f"{name}: {duration * 1000:.3f} ms")
+        texts = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+
+        line_height = self.font.get_linesize()
+        histogram = profiler.histogram()
+        bar_width = 4
+        histogram_height = 32
+        width = max(max(text.get_width() for text in texts), bar_width * HISTOGRAM_BINS)
+        height = line_height * len(texts) + histogram_height + 4
+
+        panel = pg.Surface((width + 8, height + 8), pg.SRCALPHA)
+        panel.fill((0, 0, 0, 180))
+        for index, text in enumerate(texts):
+            panel.blit(text, (4, 4 + index * line_height))
+        # Frames slower than 60 FPS are drawn in red
+        highest = max(max(histogram), 1)
+        bottom = 4 + line_height * len(texts) + histogram_height
+        for index, count in enumerate(histogram):
+            bar_height = count * histogram_height // highest
+            pg.draw.rect(
+                panel,
+                (255, 80, 80) if index * HISTOGRAM_BIN >= 16 else (80, 255, 80),
+                (4 + index * bar_width, bottom - bar_height, bar_width - 1, bar_height),
+            )
+        return panel
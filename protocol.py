@@ -0,0 +1,110 @@
+"""
+PySnake multiplayer protocol
+Messages between the server and its players, every message is sent as its size
+followed by its bytes. A player gets the whole arena once when it joins, then
+only the changes of every tick.
+"""
+
+import asyncio
+import struct
+from typing import Iterator
+
+import engine
+
+# Size of the message that follows
+FRAME = struct.Struct("<I")
+
+# Server to player: WELCOME once, then TICK on every tick
+# welcome: kind, player id, width, height, tick, number of events of the next
+# tick already in the welcome, number of snakes
+WELCOME = struct.Struct("<cIHHIII")
+# a snake of the welcome message: player id, direction, length, then its cells
+SNAKE = struct.Struct("<IBI")
+# tick: kind, tick, time it was sent (time.time), number of events
+TICK = struct.Struct("<cIdI")
+# an event of the tick message: kind, id and cell, see arena.py
+EVENT = struct.Struct("<BIi")
+# Player to server: kind, index of the new direction in engine.DIRECTIONS
+INPUT = struct.Struct("<cB")
+
+WELCOME_KIND = b"W"
+TICK_KIND = b"T"
+INPUT_KIND = b"D"
+
+# Messages bigger than this are refused instead of being read
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+
+def frame(message: bytes) -> bytes:
+    return FRAME.pack(len(message)) + message
+
+
+async def read_message(
+    reader: asyncio.StreamReader, max_size: int = MAX_MESSAGE_SIZE
+) -> bytes:
+    (size,) = FRAME.unpack(await reader.readexactly(FRAME.size))
+    if size > max_size:
+        raise ValueError(f"Message of {size} bytes is too big")
+    return await reader.readexactly(size)
+
+
+def encode_welcome(
+    player: int,
+    width: int,
+    height: int,
+    tick: int,
+    skipped: int,
+    snakes: list[tuple[int, engine.Cell, list[int]]],
+    foods: list[int],
+) -> bytes:
+    parts = [
+        WELCOME.pack(WELCOME_KIND, player, width, height, tick, skipped, len(snakes))
+    ]
+    for snake_player, direction, cells in snakes:
+        parts.append(
+            SNAKE.pack(snake_player, engine.DIRECTIONS.index(direction), len(cells))
+        )
+        parts.append(struct.pack(f"<{len(cells)}I", *cells))
+    parts.append(FRAME.pack(len(foods)))
+    parts.append(struct.pack(f"<{len(foods)}i", *foods))
+    return b"".join(parts)
+
+
+def decode_welcome(
+    message: bytes,
+) -> tuple[
+    int, int, int, int, int, list[tuple[int, engine.Cell, list[int]]], list[int]
+]:
+    _, player, width, height, tick, skipped, snake_count = WELCOME.unpack_from(message)
+    offset = WELCOME.size
+    snakes = []
+    for _ in range(snake_count):
+        snake_player, direction, length = SNAKE.unpack_from(message, offset)
+        offset += SNAKE.size
+        cells = list(struct.unpack_from(f"<{length}I", message, offset))
+        offset += 4 * length
+        snakes.append((snake_player, engine.DIRECTIONS[direction], cells))
+    (food_count,) = FRAME.unpack_from(message, offset)
+    foods = list(struct.unpack_from(f"<{food_count}i", message, offset + FRAME.size))
+    return player, width, height, tick, skipped, snakes, foods
+
+
+def encode_tick(tick: int, sent: float, events: list[tuple[int, int, int]]) -> bytes:
+    header = TICK.pack(TICK_KIND, tick, sent, len(events))
+    return header + b"".join([EVENT.pack(*event) for event in events])
+
+
+def decode_tick(message: bytes) -> tuple[int, float, Iterator[tuple[int, int, int]]]:
+    _, tick, sent, _ = TICK.unpack_from(message)
+    return tick, sent, EVENT.iter_unpack(memoryview(message)[TICK.size :])
+
+
+def encode_input(direction: engine.Cell) -> bytes:
+    return INPUT.pack(INPUT_KIND, engine.DIRECTIONS.index(direction))
+
+
+def decode_input(message: bytes) -> engine.Cell:
+    kind, direction = INPUT.unpack(message)
+    if kind != INPUT_KIND or direction >= len(engine.DIRECTIONS):
+        raise ValueError(f"Unknown input {message!r}")
+    return engine.DIRECTIONS[direction]
@@ -0,0 +1,822 @@
+"""
+PySnake rendering
+Draws the game with pygame on the window or on any other surface.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Callable, Optional, Sequence, Tuple
+
+import pygame as pg
+
+import engine
+from assets import load_sprites
+from engine import UP, DOWN, LEFT, RIGHT, Cell, direction_between
+from text import TextRenderer
+
+# Configuration screen
+CELL_SIZE = 32
+# The window can be shrunk until the cells are this small
+MIN_CELL_SIZE = 8
+# Cells around the view: the fences on the sides, the score panel above and the
+# pause hint under
+BORDER_CELLS_HORIZONTAL = 2
+BORDER_CELLS_VERTICAL = 7
+# Bytes of sprites kept for the cell sizes that are not used anymore
+SPRITE_CACHE_BYTES = 16 * 1024 * 1024
+
+# Text shadow offset
+TEXT_SHADOW_OFFSET = 4
+
+# Sides a fence tile has rails on, the tile of a wall is picked by the walls
+# next to it
+NORTH = 1
+SOUTH = 2
+WEST = 4
+EAST = 8
+FENCE_TILES = {
+    0: "POST",
+    SOUTH: "TOP_END",
+    NORTH: "BOT_END",
+    EAST: "LEFT_END",
+    WEST: "RIGHT_END",
+    NORTH | SOUTH: "VERTICAL_MID",
+    WEST | EAST: "HORIZONTAL_MID",
+    EAST | SOUTH: "TOP_LEFT",
+    WEST | SOUTH: "TOP_RIGHT",
+    NORTH | EAST: "BOT_LEFT",
+    NORTH | WEST: "BOT_RIGHT",
+    WEST | EAST | SOUTH: "TOP_MID",
+    NORTH | WEST | EAST: "BOT_MID",
+    NORTH | EAST | SOUTH: "LEFT_MID",
+    NORTH | WEST | SOUTH: "RIGHT_MID",
+    NORTH | SOUTH | WEST | EAST: "CROSS",
+}
+
+
+class Layout:
+    # Sizes and offsets of everything on the screen, in pixels. When the board is
+    # bigger than the view, the view shows the cells around a camera that
+    # follows the snake.
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        cell_size: int = CELL_SIZE,
+        view_width: Optional[int] = None,
+        view_height: Optional[int] = None,
+    ):
+        # The number of cells of the board
+        self.width = width
+        self.height = height
+        # The number of cells that are visible
+        self.view_width = min(width, view_width or width)
+        self.view_height = min(height, view_height or height)
+        # The top left visible cell
+        self.camera_x = 0
+        self.camera_y = 0
+        self.cell_size = cell_size
+        self.top_offset = cell_size * 5
+        self.horizontal_offset = cell_size
+        self.bot_offset = cell_size * 2
+
+        # Calculate the width and height of the screen
+        self.play_area_width = self.view_width * cell_size
+        self.play_area_height = self.view_height * cell_size
+        self.screen_width = self.play_area_width + 2 * self.horizontal_offset
+        self.screen_height = self.play_area_height + self.top_offset + self.bot_offset
+
+    # Texts are sized for the default cell size and scaled with the cells
+    def text_size(self, size: int) -> int:
+        return max(size * self.cell_size // CELL_SIZE, 8)
+
+    def scrolling(self) -> bool:
+        return self.view_width < self.width or self.view_height < self.height
+
+    def is_visible(self, x: int, y: int) -> bool:
+        return (
+            self.camera_x <= x < self.camera_x + self.view_width
+            and self.camera_y <= y < self.camera_y + self.view_height
+        )
+
+    # Move the camera when the given cell gets close to the border of the view,
+    # so that the cell is in the middle of the view again. Return whether the
+    # camera moved.
+    def follow(self, x: int, y: int) -> bool:
+        camera_x = self.follow_axis(x, self.camera_x, self.view_width, self.width)
+        camera_y = self.follow_axis(y, self.camera_y, self.view_height, self.height)
+        if (camera_x, camera_y) == (self.camera_x, self.camera_y):
+            return False
+        self.camera_x = camera_x
+        self.camera_y = camera_y
+        return True
+
+    @staticmethod
+    def follow_axis(position: int, camera: int, view: int, size: int) -> int:
+        margin = view // 4
+        if camera + margin <= position < camera + view - margin:
+            return camera
+        return min(max(position - view // 2, 0), size - view)
+
+    def play_area_rect(self) -> pg.Rect:
+        return pg.Rect(
+            self.horizontal_offset,
+            self.top_offset,
+            self.play_area_width,
+            self.play_area_height,
+        )
+
+    # Position of a cell on the whole board, as if the camera was on the top left cell
+    def board_position(self, x: int, y: int) -> Tuple[int, int]:
+        return (
+            x * self.cell_size + self.horizontal_offset,
+            y * self.cell_size + self.top_offset,
+        )
+
+    def calculate_position(self, x: int, y: int) -> Tuple[int, int]:
+        return (
+            (x - self.camera_x) * self.cell_size + self.horizontal_offset,
+            (y - self.camera_y) * self.cell_size + self.top_offset,
+        )
+
+    def calculate_rect(self, x: int, y: int, size: int = 1) -> pg.Rect:
+        translated_pos = self.calculate_position(x, y)
+        return pg.Rect(
+            translated_pos[0],
+            translated_pos[1],
+            self.cell_size * size,
+            self.cell_size * size,
+        )
+
+
+class Sprites:
+    # The sprites scaled to a cell size, with the snake's direction mappings
+    def __init__(self, cell_size: int):
+        sprites = load_sprites(cell_size)
+        self.surfaces = sprites
+        self.icon = sprites["ICON"]
+        self.food = sprites["FOOD"]
+        # The food scaled to the bigger food sizes, made when first drawn
+        self.big_foods: dict[int, pg.Surface] = {1: self.food}
+        self.fence = {name: sprites[name] for name in FENCE_TILES.values()}
+
+        # Snake's direction mapping
+        self.snake_head = {
+            tuple(UP): sprites["HEAD_UP"],
+            tuple(DOWN): sprites["HEAD_DOWN"],
+            tuple(LEFT): sprites["HEAD_LEFT"],
+            tuple(RIGHT): sprites["HEAD_RIGHT"],
+        }
+
+        self.snake_tail = {
+            tuple(UP): sprites["TAIL_UP"],
+            tuple(DOWN): sprites["TAIL_DOWN"],
+            tuple(LEFT): sprites["TAIL_LEFT"],
+            tuple(RIGHT): sprites["TAIL_RIGHT"],
+        }
+
+        self.snake_body = {
+            # Going in the straight line
+            tuple((tuple(UP), tuple(UP))): sprites["BODY_VERTICAL"],
+            tuple((tuple(DOWN), tuple(DOWN))): sprites["BODY_VERTICAL"],
+            tuple((tuple(LEFT), tuple(LEFT))): sprites["BODY_HORIZONTAL"],
+            tuple((tuple(RIGHT), tuple(RIGHT))): sprites["BODY_HORIZONTAL"],
+            # Curve
+            tuple((tuple(UP), tuple(LEFT))): sprites["BODY_TOP_RIGHT"],
+            tuple((tuple(UP), tuple(RIGHT))): sprites["BODY_TOP_LEFT"],
+            tuple((tuple(DOWN), tuple(LEFT))): sprites["BODY_BOTTOM_RIGHT"],
+            tuple((tuple(DOWN), tuple(RIGHT))): sprites["BODY_BOTTOM_LEFT"],
+            tuple((tuple(LEFT), tuple(UP))): sprites["BODY_BOTTOM_LEFT"],
+            tuple((tuple(LEFT), tuple(DOWN))): sprites["BODY_TOP_LEFT"],
+            tuple((tuple(RIGHT), tuple(UP))): sprites["BODY_BOTTOM_RIGHT"],
+            tuple((tuple(RIGHT), tuple(DOWN))): sprites["BODY_TOP_RIGHT"],
+        }
+
+    def food_of_size(self, size: int) -> pg.Surface:
+        sprite = self.big_foods.get(size)
+        if sprite is None:
+            width, height = self.food.get_size()
+            sprite = pg.transform.scale(self.food, (width * size, height * size))
+            self.big_foods[size] = sprite
+        return sprite
+
+
+# Sprites scaled to the cell sizes that were used last. Scaling happens once per
+# cell size, the least recently used sizes are dropped when their sprites take
+# more than max_bytes.
+class SpriteCache:
+    def __init__(self, max_bytes: int = SPRITE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.sizes: OrderedDict[int, tuple[Sprites, int]] = OrderedDict()
+        self.bytes = 0
+
+    def get(self, cell_size: int) -> Sprites:
+        cached = self.sizes.get(cell_size)
+        if cached is not None:
+            self.sizes.move_to_end(cell_size)
+            return cached[0]
+
+        sprites = Sprites(cell_size)
+        size = sum(
+            sprite.get_width() * sprite.get_height() * sprite.get_bytesize()
+            for sprite in sprites.surfaces.values()
+        )
+        self.sizes[cell_size] = (sprites, size)
+        self.bytes += size
+        # The sprites that were just made are kept whatever their size
+        while self.bytes > self.max_bytes and len(self.sizes) > 1:
+            _, (_, dropped) = self.sizes.popitem(last=False)
+            self.bytes -= dropped
+        return sprites
+
+
+# The cell size that fits a view of the board in a window
+def fit_cell_size(
+    view_width: int, view_height: int, window_width: int, window_height: int
+) -> int:
+    return max(
+        min(
+            window_width // (view_width + BORDER_CELLS_HORIZONTAL),
+            window_height // (view_height + BORDER_CELLS_VERTICAL),
+        ),
+        MIN_CELL_SIZE,
+    )
+
+
+# Search snake mapping
+def search_snake_mapping(d: dict[tuple, pg.Surface], *directions: Cell) -> pg.Surface:
+    if len(directions) == 1:
+        direction = tuple(directions[0])
+        if direction in d:
+            return d[direction]
+        raise Exception(f"Direction {direction} not found in the mapping")
+    else:
+        direction = tuple(list(tuple(_direction) for _direction in directions))
+        if direction in d:
+            return d[direction]
+        raise Exception(f"Direction {direction} not found in the mapping")
+
+
+class View:
+    # Where and how a game is drawn: the target surface, its layout, the sprites
+    # and the text renderer
+    def __init__(
+        self,
+        surface: pg.Surface,
+        layout: Layout,
+        sprites: Optional[Sprites] = None,
+        text: Optional[TextRenderer] = None,
+        sprite_cache: Optional[SpriteCache] = None,
+    ):
+        self.surface = surface
+        self.layout = layout
+        self.sprite_cache = sprite_cache if sprite_cache is not None else SpriteCache()
+        self.sprites = (
+            sprites if sprites is not None else self.sprite_cache.get(layout.cell_size)
+        )
+        # Fonts and rendered texts are cached
+        self.text = text if text is not None else TextRenderer(TEXT_SHADOW_OFFSET)
+
+    # Draw on another surface with another layout, the camera stays where it was
+    def resize(self, surface: pg.Surface, layout: Layout):
+        layout.camera_x = min(self.layout.camera_x, layout.width - layout.view_width)
+        layout.camera_y = min(self.layout.camera_y, layout.height - layout.view_height)
+        self.surface = surface
+        self.layout = layout
+        self.sprites = self.sprite_cache.get(layout.cell_size)
+
+
+class GameObject(ABC):
+    @abstractmethod
+    def draw(self):
+        pass
+
+
+class Snake(engine.Snake, GameObject):
+    def __init__(self, board: engine.Board, view: View):
+        super(Snake, self).__init__(board)
+        self.view = view
+        # The sprite and the position on the board (in pixels, without the camera)
+        # of every board cell the snake is in. Only the parts at both ends change
+        # when the snake moves.
+        self.reset_parts()
+
+    # Find the sprite of every body part again, after the body was replaced
+    def reset_parts(self):
+        # Indexing the middle of a deque is slow, go through a copy of the body
+        body = list(self.body)
+        self.parts: list[Optional[Tuple[pg.Surface, Tuple[int, int]]]] = [None] * len(
+            self.board.cells
+        )
+        for index, cell in enumerate(body):
+            self.parts[cell] = self.part(index, body)
+
+    # Get the sprite and the board position of a body part, the neighbours are
+    # looked up from the ends of the body
+    def part(
+        self, index: int, body: Optional[Sequence[int]] = None
+    ) -> Tuple[pg.Surface, Tuple[int, int]]:
+        if body is None:
+            body = self.body
+        sprites = self.view.sprites
+        position = self.board.position
+        length = len(body)
+        index %= length
+        part = position(body[index])
+        if index == length - 1:
+            # Draw the head
+            sprite = search_snake_mapping(sprites.snake_head, self.current_direction)
+        elif index == 0:
+            # Draw the tail
+            sprite = search_snake_mapping(
+                sprites.snake_tail, direction_between(part, position(body[1]))
+            )
+        else:
+            # Get the direction of the body part
+            first_body_part_direction = direction_between(
+                position(body[index - 1]), part
+            )
+            second_body_part_direction = direction_between(
+                part, position(body[index + 1])
+            )
+            sprite = search_snake_mapping(
+                sprites.snake_body,
+                first_body_part_direction,
+                second_body_part_direction,
+            )
+        return sprite, self.view.layout.board_position(part[0], part[1])
+
+    def move(self) -> int:
+        grow = self.increase_in_next_tick
+        tail = self.body[0]
+        hit = super(Snake, self).move()
+
+        # The tail moved to the next part, which now gets the tail sprite
+        if not grow:
+            self.parts[tail] = None
+            self.parts[self.body[0]] = self.part(0)
+        # The old head becomes a body part and the new head is added
+        self.parts[self.body[-2]] = self.part(-2)
+        self.parts[self.body[-1]] = self.part(-1)
+        return hit
+
+    # Draw the parts that are in the view, going through the body or through the
+    # visible cells, whichever is shorter
+    def draw(self):
+        layout = self.view.layout
+        parts = self.parts
+        if not layout.scrolling():
+            self.view.surface.blits([parts[cell] for cell in self.body], doreturn=False)
+            return
+
+        if len(self.body) <= layout.view_width * layout.view_height:
+            is_visible = layout.is_visible
+            position = self.board.position
+            cells = [cell for cell in self.body if is_visible(*position(cell))]
+        else:
+            index = self.board.index
+            cells = [
+                cell
+                for y in range(layout.camera_y, layout.camera_y + layout.view_height)
+                for cell in range(
+                    index(layout.camera_x, y),
+                    index(layout.camera_x + layout.view_width, y),
+                )
+                if parts[cell] is not None
+            ]
+        scroll_x = layout.camera_x * layout.cell_size
+        scroll_y = layout.camera_y * layout.cell_size
+        self.view.surface.blits(
+            [
+                (sprite, (x - scroll_x, y - scroll_y))
+                for sprite, (x, y) in (parts[cell] for cell in cells)
+            ],
+            doreturn=False,
+        )
+
+    def draw_cell(self, cell: int):
+        layout = self.view.layout
+        sprite, (x, y) = self.parts[cell]
+        self.view.surface.blit(
+            sprite,
+            (
+                x - layout.camera_x * layout.cell_size,
+                y - layout.camera_y * layout.cell_size,
+            ),
+        )
+
+
+class Food(engine.Food, GameObject):
+    def __init__(self, pos: Optional[Cell], size: int, view: View):
+        super(Food, self).__init__(pos, size)
+        self.view = view
+
+    def draw(self):
+        if self.pos is None:
+            return
+        layout = self.view.layout
+        food_rect = layout.calculate_rect(self.pos[0], self.pos[1], self.size)
+        # Only the part in the view is drawn, not over the fences or the panel
+        visible_rect = food_rect.clip(layout.play_area_rect())
+        area = visible_rect.move(-food_rect.x, -food_rect.y)
+        self.view.surface.blit(
+            self.view.sprites.food_of_size(self.size), visible_rect, area
+        )
+
+
+class Game(engine.Game):
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        view: View,
+        seed: Optional[int] = None,
+        clock: Callable[[], float] = time.perf_counter,
+        food_kinds: Sequence[engine.FoodKind] = (),
+        level: Optional[engine.Level] = None,
+    ):
+        self.view = view
+        # Board positions that changed since the last draw
+        self.dirty_positions: set[Cell] = set()
+        super(Game, self).__init__(width, height, seed, clock, food_kinds, level)
+        # The tile of every wall of the level, picked once
+        self.wall_rows = self.pick_wall_tiles()
+        # The board, the fences and the score panel never change, they are drawn
+        # once into this surface which is then copied under everything else
+        self.background = self.create_background()
+        # The state the screen was last drawn in, the whole screen is redrawn when it changes
+        self.drawn_state = None
+        # The score that is on the screen and where it was drawn
+        self.drawn_score = 0
+        self.score_rect = pg.Rect(0, 0, 0, 0)
+
+    def create_snake(self) -> Snake:
+        return Snake(self.board, self.view)
+
+    def create_food(self, pos: Optional[Cell], size: int) -> Food:
+        return Food(pos, size, self.view)
+
+    def init(self):
+        super(Game, self).init()
+        self.drawn_state = None
+
+    # The snake parts are looked up again and the whole screen is redrawn
+    def restore(self, state: engine.GameState):
+        super(Game, self).restore(state)
+        self.snake.reset_parts()
+        self.dirty_positions.clear()
+        self.drawn_state = None
+
+    # Draw everything again after the view was resized, the background and the
+    # snake parts depend on the cell size
+    def relayout(self):
+        self.background = self.create_background()
+        self.snake.reset_parts()
+        self.dirty_positions.clear()
+        self.drawn_state = None
+
+    def tick(self) -> list[str]:
+        if self.state != engine.RUNNING:
+            return []
+
+        # Only the ends of the snake and the foods that moved change in a tick,
+        # the foods mark their cells when they move
+        body = self.snake.body
+        position = self.board.position
+        changed = {position(body[0]), position(body[-1])}
+
+        events = super(Game, self).tick()
+
+        changed.update((position(body[0]), position(body[-1])))
+        self.dirty_positions |= changed
+        return events
+
+    def place_food(self, food: engine.Food, pos: Optional[Cell]):
+        if food.pos is not None:
+            self.dirty_positions.update(food.positions())
+        super(Game, self).place_food(food, pos)
+        if pos is not None:
+            self.dirty_positions.update(food.positions())
+
+    # The walls of the level by row, as their x and tile name sorted by x. A
+    # wall has rails towards the walls next to it and towards the fence around
+    # the board.
+    def pick_wall_tiles(self) -> list[list[tuple[int, str]]]:
+        level = self.level
+        rows = [[] for _ in range(self.height)]
+        if level is None:
+            return rows
+
+        def is_wall(x: int, y: int) -> bool:
+            if not engine.check_collision((x, y), (0, 0), (self.width, self.height)):
+                return True
+            return level.is_wall(x, y)
+
+        for cell in level.wall_cells:
+            x, y = self.board.position(cell)
+            sides = (
+                NORTH * is_wall(x, y - 1)
+                | SOUTH * is_wall(x, y + 1)
+                | WEST * is_wall(x - 1, y)
+                | EAST * is_wall(x + 1, y)
+            )
+            rows[y].append((x, FENCE_TILES[sides]))
+        return rows
+
+    def create_background(self) -> pg.Surface:
+        layout = self.view.layout
+        background = pg.Surface((layout.screen_width, layout.screen_height))
+        background.fill((65, 152, 10))
+        self.draw_board(background)
+        self.draw_walls(background)
+        self.draw_fence(background)
+        self.draw_score_panel(background)
+        return background
+
+    # Draw what changed since the last call and return the areas of the screen to update
+    def draw(self) -> list[pg.Rect]:
+        screen = self.view.surface
+        # Everything moves on the screen when the camera moves
+        layout = self.view.layout
+        if self.state == engine.RUNNING or self.state == engine.PAUSED:
+            if layout.scrolling() and layout.follow(*self.snake.head()):
+                self.background = self.create_background()
+                self.drawn_state = None
+
+        if self.state != self.drawn_state:
+            self.drawn_state = self.state
+            self.dirty_positions.clear()
+            self.draw_all()
+            return [screen.get_rect()]
+
+        if self.state == engine.NOT_YET_STARTED or self.state == engine.GAME_OVER:
+            return []
+
+        # Copy the background over the old score and write the new one
+        rects = []
+        if self.score() != self.drawn_score:
+            old_score_rect = self.score_rect
+            screen.blit(self.background, old_score_rect, old_score_rect)
+            self.draw_score()
+            rects.append(old_score_rect.union(self.score_rect))
+
+        # Restore the background of the changed cells that are visible, then draw
+        # the snake parts and the foods that are in them. A food is drawn again
+        # over all of its cells.
+        layout = self.view.layout
+        parts = self.snake.parts
+        index = self.board.index
+        food_cells = self.food_cells
+        foods = {
+            food_cells[cell]
+            for cell in (index(x, y) for x, y in self.dirty_positions)
+            if cell in food_cells
+        }
+        for food in foods:
+            if food.size > 1:
+                self.dirty_positions.update(food.positions())
+        for x, y in self.dirty_positions:
+            if not engine.check_collision((x, y), (0, 0), (self.width, self.height)):
+                continue
+            if not layout.is_visible(x, y):
+                continue
+            rect = layout.calculate_rect(x, y)
+            screen.blit(self.background, rect, rect)
+            rects.append(rect)
+            cell = index(x, y)
+            if parts[cell] is not None:
+                self.snake.draw_cell(cell)
+        for food in foods:
+            food.draw()
+        self.dirty_positions.clear()
+        return rects
+
+    def draw_all(self):
+        screen = self.view.surface
+        if self.state == engine.NOT_YET_STARTED:
+            screen.fill((65, 152, 10))
+            self.draw_start_screen()
+            return
+
+        if self.state == engine.GAME_OVER:
+            screen.fill((65, 152, 10))
+            self.draw_game_over()
+            return
+
+        screen.blit(self.background, (0, 0))
+        self.draw_score()
+        self.draw_pause_hint()
+
+        self.snake.draw()
+        for food in self.foods.values():
+            food.draw()
+
+    def draw_start_screen(self):
+        layout = self.view.layout
+        self.view.text.draw(
+            self.view.surface,
+            "Press SPACE to start",
+            layout.text_size(48),
+            (layout.screen_width // 2, layout.screen_height // 2),
+            (255, 255, 255),
+            shadow_color=(0, 0, 0),
+        )
+
+    # Draw the checkerboard of the visible cells
+    def draw_board(self, surface: pg.Surface):
+        layout = self.view.layout
+        cell_size = layout.cell_size
+        for x in range(layout.camera_x, layout.camera_x + layout.view_width):
+            first_y = layout.camera_y + (x + layout.camera_y) % 2
+            for y in range(first_y, layout.camera_y + layout.view_height, 2):
+                cell_rect = pg.rect.Rect(
+                    (x - layout.camera_x) * cell_size + layout.horizontal_offset,
+                    (y - layout.camera_y) * cell_size + layout.top_offset,
+                    cell_size,
+                    cell_size,
+                )
+                pg.draw.rect(surface, (0, 100, 0), cell_rect)
+
+    # Draw the visible walls of the level with the tiles that were picked for
+    # them, only the rows in the view are looked at
+    def draw_walls(self, surface: pg.Surface):
+        if self.level is None:
+            return
+        layout = self.view.layout
+        fence = self.view.sprites.fence
+        calculate_position = layout.calculate_position
+        first_x = (layout.camera_x,)
+        end_x = (layout.camera_x + layout.view_width,)
+        tiles = []
+        for y in range(layout.camera_y, layout.camera_y + layout.view_height):
+            row = self.wall_rows[y]
+            for x, name in row[bisect_left(row, first_x) : bisect_left(row, end_x)]:
+                tiles.append((fence[name], calculate_position(x, y)))
+        surface.blits(tiles, doreturn=False)
+
+    # The fence tile of the border of the board next to a cell of the play area,
+    # with a rail towards the cell when it is a wall
+    def border_tile(self, x: int, y: int, straight: str, junction: str) -> str:
+        if self.level is not None and self.level.is_wall(x, y):
+            return junction
+        return straight
+
+    # Draw the fences around the view, on the sides where the view reaches the
+    # border of the board
+    def draw_fence(self, surface: pg.Surface):
+        layout = self.view.layout
+        fence = self.view.sprites.fence
+        cell_size = layout.cell_size
+        left = layout.horizontal_offset - cell_size
+        right = layout.play_area_width + layout.horizontal_offset
+        top = layout.top_offset - cell_size
+        bottom = layout.screen_height - layout.bot_offset
+        left_edge = layout.camera_x == 0
+        right_edge = layout.camera_x + layout.view_width == self.width
+        top_edge = layout.camera_y == 0
+        bottom_edge = layout.camera_y + layout.view_height == self.height
+
+        # A corner continues the fence of its side when the other side is not there
+        def corner(name: str, horizontal: bool, vertical: bool, position: Cell):
+            if horizontal and vertical:
+                surface.blit(fence[name], position)
+            elif horizontal:
+                surface.blit(fence["HORIZONTAL_MID"], position)
+            elif vertical:
+                surface.blit(fence["VERTICAL_MID"], position)
+
+        # Draw the horizontal fence
+        corner("TOP_LEFT", top_edge, left_edge, (left, top))
+        corner("BOT_LEFT", bottom_edge, left_edge, (left, bottom))
+        for x in range(layout.view_width):
+            board_x = layout.camera_x + x
+            # Draw the top fence
+            if top_edge:
+                tile = self.border_tile(board_x, 0, "HORIZONTAL_MID", "TOP_MID")
+                surface.blit(
+                    fence[tile], (x * cell_size + layout.horizontal_offset, top)
+                )
+            # Draw the bottom fence
+            if bottom_edge:
+                tile = self.border_tile(
+                    board_x, self.height - 1, "HORIZONTAL_MID", "BOT_MID"
+                )
+                surface.blit(
+                    fence[tile], (x * cell_size + layout.horizontal_offset, bottom)
+                )
+        corner("TOP_RIGHT", top_edge, right_edge, (right, top))
+        corner("BOT_RIGHT", bottom_edge, right_edge, (right, bottom))
+
+        # Draw the vertical fences
+        for y in range(layout.view_height):
+            board_y = layout.camera_y + y
+            if left_edge:
+                tile = self.border_tile(0, board_y, "VERTICAL_MID", "LEFT_MID")
+                surface.blit(fence[tile], (left, y * cell_size + layout.top_offset))
+            if right_edge:
+                tile = self.border_tile(
+                    self.width - 1, board_y, "VERTICAL_MID", "RIGHT_MID"
+                )
+                surface.blit(fence[tile], (right, y * cell_size + layout.top_offset))
+
+    def draw_score_panel(self, surface: pg.Surface):
+        layout = self.view.layout
+        cell_size = layout.cell_size
+        # Draw the score panel
+        score_panel_rect = pg.rect.Rect(
+            layout.horizontal_offset - (cell_size // 2),
+            cell_size // 2,
+            layout.play_area_width + cell_size,
+            layout.top_offset - 2 * cell_size,
+        )
+        pg.draw.rect(surface, (255, 255, 255), score_panel_rect, 2)
+
+        # Draw the game name and the author under
+        self.view.text.draw(
+            surface,
+            "PySnake",
+            layout.text_size(48),
+            (layout.screen_width // 2, cell_size + cell_size // 2),
+            (255, 255, 255),
+            shadow_color=(0, 0, 0),
+        )
+
+    def draw_score(self):
+        layout = self.view.layout
+        # Draw the score text
+        self.score_rect = self.view.text.draw(
+            self.view.surface,
+            f"Score: {self.score()}",
+            layout.text_size(36),
+            (layout.screen_width // 2, layout.top_offset // 2 + layout.cell_size // 2),
+            (255, 255, 255),
+        )
+        self.drawn_score = self.score()
+
+    def draw_pause_hint(self):
+        layout = self.view.layout
+        # Draw the instruction to pause the game
+        self.view.text.draw(
+            self.view.surface,
+            (
+                "Press SPACE to pause"
+                if self.state == engine.RUNNING
+                else "Press SPACE to resume"
+            ),
+            layout.text_size(24),
+            (
+                layout.screen_width // 2,
+                layout.top_offset
+                + layout.play_area_height
+                + layout.cell_size
+                + layout.cell_size // 2,
+            ),
+            (255, 255, 255),
+        )
+
+    def draw_game_over(self):
+        text = self.view.text
+        screen = self.view.surface
+        layout = self.view.layout
+        center_x = layout.screen_width // 2
+        center_y = layout.screen_height // 2
+        cell_size = layout.cell_size
+
+        text.draw(
+            screen,
+            "Game Over",
+            layout.text_size(48),
+            (center_x, center_y - 2 * cell_size),
+            (255, 255, 255),
+            shadow_color=(0, 0, 0),
+        )
+
+        # Draw the score text
+        text.draw(
+            screen,
+            f"Score: {self.score()}",
+            layout.text_size(36),
+            (center_x, center_y),
+            (255, 255, 255),
+        )
+
+        # Draw the win or lose message
+        text.draw(
+            screen,
+            "You Win!" if self.is_won() else "You Lose!",
+            layout.text_size(36),
+            (center_x, center_y + 4 * cell_size),
+            (255, 255, 255),
+            shadow_color=(0, 0, 0),
+        )
+
+        # Draw the instruction to restart the game, only its shadow is drawn
+        text.draw(
+            screen,
+            "Press SPACE to restart",
+            layout.text_size(24),
+            (center_x + text.shadow_offset, center_y + 6 * cell_size),
+            (0, 0, 0),
+        )
@@ -0,0 +1,256 @@
+"""
+PySnake replays
+A game is stored as its board size, its seed and the direction changes of the
+snake, which is enough to play it again through Game.tick. Replays are
+appended to archive files that can be scanned through a memory map.
+"""
+
+import mmap
+import os
+import struct
+from typing import Callable, Iterator, Optional
+
+import engine
+
+# Every replay of an archive starts with this header:
+# magic, version, width, height, seed, ticks, score, size of the direction stream
+HEADER = struct.Struct("<4sBHHQIII")
+MAGIC = b"PSNR"
+VERSION = 1
+
+
+def default_replay_path() -> str:
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "share"
+    )
+    return os.path.join(base, "pysnake", "replays.bin")
+
+
+# The direction changes are stored as varints of the number of ticks since the
+# previous change, shifted left by 2 bits to fit the index of the new direction
+def encode_changes(changes: list[tuple[int, int]]) -> bytes:
+    stream = bytearray()
+    previous_tick = 0
+    for tick, direction in changes:
+        value = (tick - previous_tick) << 2 | direction
+        previous_tick = tick
+        while value >= 0x80:
+            stream.append(value & 0x7F | 0x80)
+            value >>= 7
+        stream.append(value)
+    return bytes(stream)
+
+
+def decode_changes(stream: bytes) -> Iterator[tuple[int, int]]:
+    tick = 0
+    value = 0
+    shift = 0
+    for byte in stream:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        tick += value >> 2
+        yield tick, value & 3
+        value = 0
+        shift = 0
+
+
+class Replay:
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        seed: int,
+        ticks: int,
+        score: int,
+        stream: bytes,
+    ):
+        self.width = width
+        self.height = height
+        self.seed = seed
+        # Number of ticks of the game and its final score, they are stored so an
+        # archive can be searched without playing the games
+        self.ticks = ticks
+        self.score = score
+        # Encoded direction changes, see encode_changes
+        self.stream = stream
+
+    # The tick index at which each direction change happens and the index of the
+    # new direction in engine.DIRECTIONS
+    def changes(self) -> Iterator[tuple[int, int]]:
+        return decode_changes(self.stream)
+
+    def to_bytes(self) -> bytes:
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            self.width,
+            self.height,
+            self.seed,
+            self.ticks,
+            self.score,
+            len(self.stream),
+        )
+        return header + bytes(self.stream)
+
+
+def save_replay(path: str, replay: Replay):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "ab") as archive:
+        archive.write(replay.to_bytes())
+
+
+# Read the replays of an archive one after the other, the direction streams are
+# views into the memory map and are only decoded when the replay is played.
+# The replays have to be released before the archive is closed.
+class ReplayArchive:
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = (
+            mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        )
+
+    def __iter__(self) -> Iterator[Replay]:
+        data = memoryview(self.map)
+        offset = 0
+        while offset < len(data):
+            if len(data) - offset < HEADER.size:
+                raise ValueError(f"Truncated replay header at byte {offset}")
+            magic, version, width, height, seed, ticks, score, size = (
+                HEADER.unpack_from(data, offset)
+            )
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Not a replay at byte {offset}")
+            offset += HEADER.size
+            if len(data) - offset < size:
+                raise ValueError(f"Truncated replay stream at byte {offset}")
+            yield Replay(
+                width, height, seed, ticks, score, data[offset : offset + size]
+            )
+            offset += size
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self) -> "ReplayArchive":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Record the games played by a Game, its tick has to be called through the recorder
+class Recorder:
+    def __init__(
+        self, game: engine.Game, on_finish: Optional[Callable[[Replay], None]] = None
+    ):
+        self.game = game
+        # Called with the replay of every game that ends
+        self.on_finish = on_finish
+        self.changes: list[tuple[int, int]] = []
+        self.direction = game.snake.current_direction
+
+    def tick(self) -> list[str]:
+        game = self.game
+        if game.state != engine.RUNNING:
+            return game.tick()
+
+        # A new game started
+        if game.ticks == 0:
+            self.changes = []
+            self.direction = game.snake.current_direction
+        tick = game.ticks
+
+        # The direction the snake moved in is recorded, queued turns are only
+        # taken by the tick
+        events = game.tick()
+        if game.snake.current_direction != self.direction:
+            self.direction = game.snake.current_direction
+            self.changes.append((tick, engine.DIRECTIONS.index(self.direction)))
+        if game.state == engine.GAME_OVER and self.on_finish is not None:
+            self.on_finish(self.replay())
+        return events
+
+    def replay(self) -> Replay:
+        game = self.game
+        return Replay(
+            game.width,
+            game.height,
+            game.seed,
+            game.ticks,
+            game.score(),
+            encode_changes(self.changes),
+        )
+
+
+# Play a replay again on a game, the game can be a headless engine.Game or one
+# that draws itself
+class Playback:
+    def __init__(self, replay: Replay, game: Optional[engine.Game] = None):
+        if game is None:
+            game = engine.Game(replay.width, replay.height)
+        if (game.width, game.height) != (replay.width, replay.height):
+            raise ValueError(
+                f"Replay is for a {replay.width}x{replay.height} board, got {game.width}x{game.height}"
+            )
+        self.replay = replay
+        self.game = game
+        self.restart()
+
+    def restart(self):
+        self.game.start(self.replay.seed)
+        self.changes = self.replay.changes()
+        self.next_change = next(self.changes, None)
+
+    def tick(self) -> list[str]:
+        game = self.game
+        # A game recorded when the player quit stops where it was interrupted
+        if game.ticks >= self.replay.ticks:
+            return []
+        if game.state == engine.RUNNING:
+            while self.next_change is not None and self.next_change[0] <= game.ticks:
+                game.change_snake_direction(engine.DIRECTIONS[self.next_change[1]])
+                self.next_change = next(self.changes, None)
+        return game.tick()
+
+    def finished(self) -> bool:
+        return (
+            self.game.state == engine.GAME_OVER or self.game.ticks >= self.replay.ticks
+        )
+
+    # Play the game without any delay up to the given tick, going back in time
+    # replays the game from its start
+    def seek(self, tick: int):
+        if tick < self.game.ticks:
+            self.restart()
+        tick = min(tick, self.replay.ticks)
+        while self.game.ticks < tick and self.game.state == engine.RUNNING:
+            self.tick()
+
+
+# Load a single replay of an archive, negative indices count from the end
+def load_replay(path: str, index: int = -1) -> Replay:
+    with ReplayArchive(path) as archive:
+        replays = list(archive)
+        try:
+            selected = replays[index]
+        except IndexError:
+            raise IndexError(
+                f"{path} has {len(replays)} replays, there is no replay {index}"
+            ) from None
+        replay = Replay(
+            selected.width,
+            selected.height,
+            selected.seed,
+            selected.ticks,
+            selected.score,
+            bytes(selected.stream),
+        )
+        del replays, selected
+    return replay
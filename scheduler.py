@@ -0,0 +1,83 @@
+"""
+PySnake scheduler
+Fixed timestep game ticks, independent from the frame rate of the window.
+"""
+
+import time
+from typing import Callable
+
+
+class FixedTimestep:
+    def __init__(
+        self,
+        tick_rate: float,
+        max_lag: float = 8 / 60,
+        frame_budget: float = 1 / 60,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.clock = clock
+        # Seconds of late ticks that are caught up at most, the ticks due for longer
+        # are dropped so a slow frame does not make the game run in a burst. It is
+        # a time and not a number of ticks, the ticks of every frame at a high tick
+        # rate are not late.
+        self.max_lag = max_lag
+        # Time spent running ticks per call in the unthrottled mode
+        self.frame_budget = frame_budget
+        # Run ticks as fast as possible instead of at the tick rate
+        self.unthrottled = False
+        self.tick_rate = tick_rate
+        self.reset()
+
+    @property
+    def tick_rate(self) -> float:
+        return self._tick_rate
+
+    @tick_rate.setter
+    def tick_rate(self, tick_rate: float):
+        if tick_rate <= 0:
+            raise ValueError(f"Tick rate must be positive, got {tick_rate}")
+        self._tick_rate = tick_rate
+        self.step = 1 / tick_rate
+
+    # Forget the time that passed, the next tick is due one step from now
+    def reset(self):
+        self.last_time = self.clock()
+        self.accumulator = 0.0
+
+    # Run the ticks that are due and return how many were run
+    def run(self, tick: Callable[[], object]) -> int:
+        now = self.clock()
+        elapsed = now - self.last_time
+        self.last_time = now
+
+        if self.unthrottled:
+            ticks = 0
+            deadline = now + self.frame_budget
+            while True:
+                tick()
+                ticks += 1
+                if self.clock() >= deadline:
+                    break
+            self.last_time = self.clock()
+            self.accumulator = 0.0
+            return ticks
+
+        self.accumulator = min(self.accumulator + elapsed, self.max_lag)
+        ticks = int(self.accumulator // self.step)
+        self.accumulator -= ticks * self.step
+        for _ in range(ticks):
+            tick()
+        return ticks
+
+    # How far the game is between the last tick and the next one, from 0 to 1,
+    # used to interpolate what is drawn between two ticks
+    def interpolation(self) -> float:
+        if self.unthrottled:
+            return 0.0
+        return min((self.accumulator + self.clock() - self.last_time) / self.step, 1.0)
+
+    # Time left before the next tick is due
+    def time_until_next_tick(self) -> float:
+        if self.unthrottled:
+            return 0.0
+        return max(self.step - self.accumulator - (self.clock() - self.last_time), 0.0)
@@ -0,0 +1,155 @@
+"""
+PySnake multiplayer server
+Runs the arena at a fixed tick rate and sends the changes of every tick to all
+the players, who only send the direction of their snake. The changes of a tick
+are encoded once and the same bytes are written to every player.
+
+    python server.py --size 200x200 --food 50 --port 7777
+    python loadtest.py --players 300 --port 7777
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+import protocol
+from arena import Arena
+from tournament import parse_size
+
+TICKRATE = 10
+# A player that lets this many bytes pile up unread is disconnected, so a slow
+# player cannot make the server buffer every tick for it
+MAX_BUFFER = 1024 * 1024
+# Seconds between two reports of the server load
+REPORT_INTERVAL = 5
+
+
+class Server:
+    def __init__(self, arena: Arena, tickrate: int = TICKRATE):
+        self.arena = arena
+        self.tickrate = tickrate
+        self.players: dict[int, asyncio.StreamWriter] = {}
+        self.tick_seconds = 0.0
+        self.slowest_tick = 0.0
+        self.sent_bytes = 0
+        self.ticks = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        arena = self.arena
+        player = arena.join()
+        # The welcome is written before any other tick can run, the player gets
+        # every change after the snapshot. The changes made since the last tick
+        # are already in it, the player skips them in the next tick.
+        skipped, snakes, foods = arena.snapshot()
+        writer.write(
+            protocol.frame(
+                protocol.encode_welcome(
+                    player,
+                    arena.width,
+                    arena.height,
+                    arena.ticks,
+                    skipped,
+                    snakes,
+                    foods,
+                )
+            )
+        )
+        self.players[player] = writer
+        try:
+            while True:
+                # A player only sends inputs, a bigger message is refused
+                message = await protocol.read_message(reader, protocol.INPUT.size)
+                arena.steer(player, protocol.decode_input(message))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.disconnect(player)
+
+    def disconnect(self, player: int):
+        writer = self.players.pop(player, None)
+        if writer is None:
+            return
+        self.arena.leave(player)
+        writer.close()
+
+    def broadcast(self, data: bytes):
+        for player, writer in list(self.players.items()):
+            if writer.transport.get_write_buffer_size() > MAX_BUFFER:
+                self.disconnect(player)
+                continue
+            writer.write(data)
+            self.sent_bytes += len(data)
+
+    # Tick at a fixed rate, a late tick is played right away and the next ones
+    # keep their schedule, like the FixedTimestep of the game
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        step = 1 / self.tickrate
+        deadline = loop.time()
+        while True:
+            deadline += step
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+            start = time.perf_counter()
+            events = self.arena.tick()
+            data = protocol.frame(
+                protocol.encode_tick(self.arena.ticks, time.time(), events)
+            )
+            self.broadcast(data)
+            elapsed = time.perf_counter() - start
+            self.ticks += 1
+            self.tick_seconds += elapsed
+            self.slowest_tick = max(self.slowest_tick, elapsed)
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(REPORT_INTERVAL)
+            ticks = max(self.ticks, 1)
+            print(
+                f"{len(self.players)} players, {len(self.arena.snakes)} snakes, "
+                f"tick {self.tick_seconds / ticks * 1000:.2f} ms "
+                f"(slowest {self.slowest_tick * 1000:.2f} ms), "
+                f"{self.sent_bytes / REPORT_INTERVAL / 1024:.0f} KiB/s sent",
+                file=sys.stderr,
+            )
+            self.ticks = 0
+            self.tick_seconds = 0.0
+            self.slowest_tick = 0.0
+            self.sent_bytes = 0
+
+
+async def serve(host: str, port: int, arena: Arena, tickrate: int, report: bool = True):
+    server = Server(arena, tickrate)
+    listener = await asyncio.start_server(server.handle, host, port)
+    tasks = [asyncio.create_task(server.run())]
+    if report:
+        tasks.append(asyncio.create_task(server.report()))
+    print(f"Serving a {arena.width}x{arena.height} arena on {host}:{port}")
+    async with listener:
+        await asyncio.gather(*tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PySnake multiplayer server")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=7777, help="port to listen on")
+    parser.add_argument(
+        "--size", type=parse_size, default=(200, 200), metavar="WxH", help="board size"
+    )
+    parser.add_argument("--food", type=int, default=50, help="number of foods")
+    parser.add_argument(
+        "--tickrate", type=int, default=TICKRATE, help="ticks per second"
+    )
+    parser.add_argument("--seed", type=int, help="seed of the arena")
+    args = parser.parse_args()
+
+    width, height = args.size
+    arena = Arena(width, height, args.food, args.seed)
+    try:
+        asyncio.run(serve(args.host, args.port, arena, args.tickrate))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+PySnake text rendering
+Fonts are created once and rendered texts are kept in a bounded cache, a text
+and its shadow are composed into a single surface.
+"""
+
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import pygame as pg
+
+Color = Tuple[int, int, int]
+
+
+class TextRenderer:
+    def __init__(self, shadow_offset: int, max_surfaces: int = 128):
+        self.shadow_offset = shadow_offset
+        self.max_surfaces = max_surfaces
+        self.fonts: dict[int, pg.font.Font] = {}
+        # Rendered surfaces by (text, size, color, shadow color), the least recently
+        # used one is dropped when the cache is full
+        self.surfaces: OrderedDict[tuple, pg.Surface] = OrderedDict()
+
+    def font(self, size: int) -> pg.font.Font:
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pg.font.Font(None, size)
+        return font
+
+    # Render a text with an optional shadow on its right
+    def render(
+        self, text: str, size: int, color: Color, shadow_color: Optional[Color] = None
+    ) -> pg.Surface:
+        key = (text, size, color, shadow_color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+
+        font = self.font(size)
+        surface = font.render(text, True, color)
+        if shadow_color is not None:
+            shadow = font.render(text, True, shadow_color)
+            composed = pg.Surface(
+                (shadow.get_width() + self.shadow_offset, shadow.get_height()),
+                pg.SRCALPHA,
+            )
+            composed.blit(shadow, (self.shadow_offset, 0))
+            composed.blit(surface, (0, 0))
+            surface = composed
+
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    # Draw a text centered on the given position (its shadow is drawn on the
+    # right of it) and return the area that was drawn
+    def draw(
+        self,
+        surface: pg.Surface,
+        text: str,
+        size: int,
+        center: Tuple[int, int],
+        color: Color,
+        shadow_color: Optional[Color] = None,
+    ) -> pg.Rect:
+        rendered = self.render(text, size, color, shadow_color)
+        width = rendered.get_width()
+        if shadow_color is not None:
+            width -= self.shadow_offset
+        rect = rendered.get_rect()
+        rect.topleft = (center[0] - width // 2, center[1] - rect.height // 2)
+        return surface.blit(rendered, rect)
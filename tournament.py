@@ -0,0 +1,269 @@
+"""
+PySnake tournament
+Plays many full games with the engine on every CPU core and streams their
+results back as they finish, for overnight soak tests and balance sweeps.
+Game i is started with the seed SEED + i, so any game can be played again.
+
+    python tournament.py --size 20x20 --games 10000 --policy autopilot
+    python tournament.py --policy scripted --script RRRRDLLLLD --output results.jsonl
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from multiprocessing import Pool
+from random import Random
+from typing import NamedTuple, Optional
+
+import engine
+from autopilot import Autopilot
+
+# How the snake of a script turns, a dot keeps the current direction
+SCRIPT_DIRECTIONS = {
+    "U": engine.UP,
+    "D": engine.DOWN,
+    "L": engine.LEFT,
+    "R": engine.RIGHT,
+    ".": None,
+}
+
+# Causes of the end of a game
+# win: the snake covers the whole board
+# wall: the snake hit the boundaries
+# self: the snake hit itself
+# full: the snake ate the last food that fit on the board
+# tick_limit: the game was stopped after the maximum number of ticks
+WIN = "win"
+WALL = "wall"
+SELF = "self"
+FULL = "full"
+TICK_LIMIT = "tick_limit"
+
+
+class Settings(NamedTuple):
+    width: int
+    height: int
+    seed: int
+    max_ticks: int
+    policy: str
+    script: str
+
+
+# Turns the snake to a random direction that does not go back on itself
+class RandomPolicy:
+    def __init__(self, game: engine.Game, seed: int):
+        self.game = game
+        self.rng = Random(seed)
+
+    def steer(self):
+        x, y = self.game.get_snake_direction()
+        choices = [d for d in engine.DIRECTIONS if d != (-x, -y)]
+        self.game.change_snake_direction(self.rng.choice(choices))
+
+
+# Turns the snake as written in a script, one letter per tick, the script starts
+# over when it ends
+class ScriptedPolicy:
+    def __init__(self, game: engine.Game, script: str):
+        if not script or any(letter not in SCRIPT_DIRECTIONS for letter in script):
+            raise ValueError(
+                f"A script is made of the letters U, D, L, R and ., got {script!r}"
+            )
+        self.game = game
+        self.script = [SCRIPT_DIRECTIONS[letter] for letter in script]
+
+    def steer(self):
+        direction = self.script[self.game.ticks % len(self.script)]
+        if direction is not None:
+            self.game.change_snake_direction(direction)
+
+
+def create_policy(settings: Settings, game: engine.Game, seed: int):
+    if settings.policy == "random":
+        return RandomPolicy(game, seed)
+    if settings.policy == "scripted":
+        return ScriptedPolicy(game, settings.script)
+    if settings.policy == "autopilot":
+        return Autopilot(game)
+    raise ValueError(f"Unknown policy {settings.policy!r}")
+
+
+def play_game(settings: Settings, index: int) -> dict:
+    seed = settings.seed + index
+    game = engine.Game(settings.width, settings.height)
+    policy = create_policy(settings, game, seed)
+
+    start = time.perf_counter()
+    game.start(seed)
+    events = []
+    while game.state == engine.RUNNING and game.ticks < settings.max_ticks:
+        policy.steer()
+        events = game.tick()
+    seconds = time.perf_counter() - start
+
+    if game.state == engine.RUNNING:
+        cause = TICK_LIMIT
+    elif engine.WIN in events:
+        cause = WIN
+    elif engine.EAT in events:
+        cause = FULL
+    elif engine.check_collision(game.snake.head(), (0, 0), (game.width, game.height)):
+        cause = SELF
+    else:
+        cause = WALL
+    return {
+        "index": index,
+        "seed": seed,
+        "score": game.score(),
+        "ticks": game.ticks,
+        "cause": cause,
+        "seconds": seconds,
+    }
+
+
+# The settings are sent once to every worker process instead of with every game
+worker_settings: Optional[Settings] = None
+
+
+def init_worker(settings: Settings):
+    global worker_settings
+    worker_settings = settings
+
+
+def play_worker_game(index: int) -> dict:
+    return play_game(worker_settings, index)
+
+
+# Running statistics of the results, nothing is kept per game
+class Summary:
+    def __init__(self):
+        self.games = 0
+        self.ticks = 0
+        self.seconds = 0.0
+        self.causes: dict[str, int] = {}
+        self.score_mean = 0.0
+        # Sum of the squared differences to the mean (Welford's algorithm)
+        self.score_squares = 0.0
+        self.score_min: Optional[int] = None
+        self.score_max: Optional[int] = None
+
+    def add(self, result: dict):
+        self.games += 1
+        self.ticks += result["ticks"]
+        self.seconds += result["seconds"]
+        self.causes[result["cause"]] = self.causes.get(result["cause"], 0) + 1
+        score = result["score"]
+        delta = score - self.score_mean
+        self.score_mean += delta / self.games
+        self.score_squares += delta * (score - self.score_mean)
+        if self.score_min is None or score < self.score_min:
+            self.score_min = score
+        if self.score_max is None or score > self.score_max:
+            self.score_max = score
+
+    def score_deviation(self) -> float:
+        return math.sqrt(self.score_squares / self.games) if self.games else 0.0
+
+    def to_dict(self, elapsed: float) -> dict:
+        return {
+            "games": self.games,
+            "ticks": self.ticks,
+            "causes": self.causes,
+            "score_mean": self.score_mean,
+            "score_deviation": self.score_deviation(),
+            "score_min": self.score_min,
+            "score_max": self.score_max,
+            "game_seconds": self.seconds,
+            "elapsed_seconds": elapsed,
+            "ticks_per_second": self.ticks / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+# Play the games and give their results back in the order they finish
+def play_games(settings: Settings, games: int, workers: int, chunk_size: int):
+    if workers <= 1:
+        for index in range(games):
+            yield play_game(settings, index)
+        return
+    with Pool(workers, initializer=init_worker, initargs=(settings,)) as pool:
+        yield from pool.imap_unordered(play_worker_game, range(games), chunk_size)
+
+
+def parse_size(size: str) -> tuple[int, int]:
+    width, _, height = size.partition("x")
+    return int(width), int(height or width)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PySnake tournament")
+    parser.add_argument(
+        "--size", type=parse_size, default=(20, 20), metavar="WxH", help="board size"
+    )
+    parser.add_argument("--games", type=int, default=1000, help="number of games")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument(
+        "--max-ticks",
+        type=int,
+        default=1_000_000,
+        help="ticks after which a game stops",
+    )
+    parser.add_argument(
+        "--policy",
+        choices=("random", "scripted", "autopilot"),
+        default="autopilot",
+        help="how the snake is steered",
+    )
+    parser.add_argument(
+        "--script", default="", help="letters U, D, L, R or . played one per tick"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of processes, 1 plays in this process",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=16, help="games sent to a worker at once"
+    )
+    parser.add_argument(
+        "--output", help="write the result of every game to this JSON lines file"
+    )
+    args = parser.parse_args()
+
+    width, height = args.size
+    settings = Settings(
+        width, height, args.seed, args.max_ticks, args.policy, args.script
+    )
+    # Fail before starting the workers
+    create_policy(settings, engine.Game(width, height), args.seed)
+
+    summary = Summary()
+    output = open(args.output, "w") if args.output else None
+    start = time.perf_counter()
+    last_report = start
+    try:
+        for result in play_games(settings, args.games, args.workers, args.chunk_size):
+            summary.add(result)
+            if output is not None:
+                output.write(json.dumps(result) + "\n")
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                last_report = now
+                print(
+                    f"{summary.games}/{args.games} games, "
+                    f"{summary.ticks / (now - start):.0f} ticks/s",
+                    file=sys.stderr,
+                )
+    finally:
+        if output is not None:
+            output.close()
+
+    json.dump(summary.to_dict(time.perf_counter() - start), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()